@@ -18,7 +18,7 @@ ARCHIVES_FOLDER = 'archived_simulations'
 
 def main() -> None:
     '''Archive simulation data.'''
-    experiment_ids = set(get_experiment_ids(EXPERIMENT_IDS))
+    experiment_ids = get_experiment_ids(EXPERIMENT_IDS)
 
     with tempfile.TemporaryDirectory() as archive_dir:
         os.mkdir(os.path.join(archive_dir, ARCHIVES_FOLDER))
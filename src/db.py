@@ -1,6 +1,8 @@
 import argparse
 import json
 import os
+import pickle
+import tempfile
 
 from vivarium.core.emitter import (
     get_local_client,
@@ -20,7 +22,9 @@ def get_experiment_data(
 
     If ``args.data_path`` is set, retrieve the experiment data from a
     JSON file named ``<experiment_id>.json`` under ``args.data_path``.
-    Otherwise, retrieve the data from MongoDB.
+    Otherwise, retrieve the data from MongoDB. If ``args.cache_dir`` is
+    set, data retrieved from MongoDB is pickled there, and later calls
+    read the pickle instead of querying MongoDB again.
 
     Args:
         args: Parsed CLI args.
@@ -32,6 +36,8 @@ def get_experiment_data(
         path = os.path.join(
             args.data_path, '{}.json'.format(experiment_id))
         with open(path, 'r') as f:
+            # Not orjson or simdjson: fields can be infinite, and both
+            # reject the Infinity tokens json writes for them.
             loaded_file = json.load(f)
             data = RawData({
                 float(time): value
@@ -40,16 +46,43 @@ def get_experiment_data(
             config = EnvironmentConfig(
                 loaded_file['environment_config'])
             return data, config
+    cache_path = ''
+    if args.cache_dir:
+        cache_path = os.path.join(
+            args.cache_dir,
+            # Include the server so that same-named databases on
+            # different MongoDB instances do not share cache entries
+            '{}_{}_{}_{}.pickle'.format(
+                args.host, args.port, args.database_name,
+                experiment_id))
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
     client = get_local_client(
         args.host, args.port, args.database_name)
     data, _ = data_from_database(experiment_id, client)
     data = remove_units(deserialize_value(data))
     environment_config = data[min(data)]['dimensions']
+    if cache_path:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        # Write to a temporary file first so that an interrupted write,
+        # or another process caching the same experiment, never leaves
+        # a partial pickle at cache_path
+        fd, tmp_path = tempfile.mkstemp(dir=args.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(
+                    (data, environment_config), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        os.replace(tmp_path, cache_path)
     return data, environment_config
 
 
 def add_connection_args(parser: argparse.ArgumentParser) -> None:
-    '''Add port, host, and db name args to an argument parser.'''
+    '''Add port, host, db name, and cache args to an argument parser.'''
     parser.add_argument(
         '--port', '-p',
         default=27017,
@@ -77,6 +110,17 @@ def add_connection_args(parser: argparse.ArgumentParser) -> None:
             'Defaults to "simulations".'
         )
     )
+    parser.add_argument(
+        '--cache_dir',
+        default='',
+        type=str,
+        help=(
+            'Folder to cache experiments retrieved from mongoDB in. '
+            'Cached experiments are read from here instead of from '
+            'mongoDB. Cache entries are keyed by host, port, database '
+            'name, and experiment ID. Caching is disabled by default.'
+        ),
+    )
 
 
 def format_data_for_snapshots(
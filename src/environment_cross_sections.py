@@ -47,22 +47,24 @@ def get_enviro_sections_plot(
         mid = i * bin_width + bin_width / 2
         x.append(mid)
 
-    y_values_ts: Dict[float, Dict[str, List[List[float]]]] = dict()
+    y_values_ts: Dict[float, Dict[str, np.ndarray]] = {
+        time: dict() for time in sorted_times}
     all_fields = list(some_timepoint.keys())
-    for time in sorted_times:
-        y_values = y_values_ts.setdefault(time, dict())
-        for field in all_fields:
-            y_values[field] = []
-            for fields_ts in fields_ts_list:
-                matrix = np.array(
-                    fields_ts[time][field])
-                # Skip infinite fields
-                if np.any(np.isinf(matrix)):
-                    continue
-                assert matrix.shape == num_bins
-                section_index = int(section_location * matrix.shape[0])
-                section = matrix[section_index, :]
-                y_values[field].append(section.tolist())
+    section_index = int(section_location * num_bins[0])
+    for field in all_fields:
+        # Stack the field into a (replicate, time, x, y) array so that
+        # the infinity checks and section slicing are array operations.
+        stacked = np.array([
+            [fields_ts[time][field] for time in sorted_times]
+            for fields_ts in fields_ts_list
+        ], dtype=float)
+        assert stacked.shape[2:] == num_bins
+        # Skip infinite fields
+        finite = ~np.isinf(stacked).any(axis=(2, 3))
+        sections = stacked[:, :, section_index, :]
+        for time_i, time in enumerate(sorted_times):
+            y_values_ts[time][field] = sections[
+                finite[:, time_i], time_i]
     field_names = list(y_values_ts[sorted_times[0]].keys())
     num_fields = len(field_names)
     figsize=(num_bins[1] * 0.8, num_fields * 4)
@@ -83,8 +85,8 @@ def get_enviro_sections_plot(
         y_values = y_values_ts[time]
         for field_i, (field, y_list) in enumerate(y_values.items()):
             y_matrix = np.array(y_list)
-            median = np.median(y_matrix, axis=0)
-            q25, q75 = np.percentile(y_matrix, [25, 75], axis=0)
+            q25, median, q75 = np.quantile(
+                y_matrix, [0.25, 0.5, 0.75], axis=0)
             stats[time] = q25, median, q75
             ax = axes[field_i]
             ax.plot(  # type: ignore
@@ -7,7 +7,8 @@ MIT license.
 Copyright (c) 2018-2020 The Vivarium Authors
 Copyright (c) 2020-2021 Christopher Skalnik
 '''
-from typing import Sequence, Iterable, Tuple, List, Dict
+from typing import (
+    Sequence, Iterable, Tuple, List, Dict, NamedTuple, Optional)
 
 from matplotlib import pyplot as plt
 import numpy as np
@@ -44,6 +45,82 @@ def _get_final_live_agents(
     return agents
 
 
+class ExpressionSurvivalData(NamedTuple):
+    '''Data shared by the expression-survival plots of a simulation.
+
+    Use :py:func:`get_expression_survival_data` to create this object.
+
+    Attributes:
+        live_finals_x: Map from each agent that survives to its final
+            value of the x variable.
+        dead_finals_x: Map from each agent that dies to its final value
+            of the x variable.
+        live_finals_y: Like ``live_finals_x`` but for the y variable.
+        dead_finals_y: Like ``dead_finals_x`` but for the y variable.
+        final_live_agents: The agents alive at the end of the time
+            range.
+        path_timeseries: Map from each path in the simulation data to
+            the timeseries of values at that path over the time range.
+    '''
+    live_finals_x: Dict[str, float]
+    dead_finals_x: Dict[str, float]
+    live_finals_y: Dict[str, float]
+    dead_finals_y: Dict[str, float]
+    final_live_agents: List[str]
+    path_timeseries: dict
+
+
+def get_expression_survival_data(
+        data: RawData,
+        path_to_x_variable: Path,
+        path_to_y_variable: Path,
+        time_range: Tuple[float, float] = (0, 1),
+        ) -> ExpressionSurvivalData:
+    '''Extract the data needed for expression-survival plots.
+
+    Computing this once and passing it to each call of
+    :py:func:`plot_expression_survival` avoids re-processing the
+    simulation data for every plot.
+
+    Parameters:
+        data: The raw data emitted from the simulation.
+        path_to_x_variable: Path from the agent root to the variable
+            plotted on the x axis.
+        path_to_y_variable: Path from the agent root to the variable
+            plotted on the y axis.
+        time_range: Tuple of two :py:class:`float`s that are
+            fractions of the total simulated time period. These
+            fractions indicate the start and end points (inclusive) of
+            the time range to consider.
+
+    Returns:
+        The extracted data for all agents.
+    '''
+    live_finals_x, dead_finals_x = _calc_live_and_dead_finals(
+        data, path_to_x_variable, time_range)
+    live_finals_y, dead_finals_y = _calc_live_and_dead_finals(
+        data, path_to_y_variable, time_range)
+    filtered_data = filter_raw_data_by_time(data, time_range)
+    return ExpressionSurvivalData(
+        live_finals_x, dead_finals_x, live_finals_y, dead_finals_y,
+        _get_final_live_agents(data, time_range),
+        path_timeseries_from_data(filtered_data),
+    )
+
+
+def _select_agents(
+        finals: Dict[str, float],
+        agents: Iterable[str]) -> Dict[str, float]:
+    agents_set = set(agents)
+    if not agents_set:
+        return finals
+    return {
+        agent: value
+        for agent, value in finals.items()
+        if agent in agents_set
+    }
+
+
 def plot_expression_survival(
         data: RawData,
         path_to_x_variable: Path,
@@ -61,6 +138,7 @@ def plot_expression_survival(
         fontsize: float = 36,
         dead_trace_agents: Iterable[str] = tuple(),
         agents_for_phylogeny_trace: Iterable[str] = tuple(),
+        survival_data: Optional[ExpressionSurvivalData] = None,
         ) -> plt.Figure:
     '''Create Expression Scatterplot Colored by Survival
 
@@ -106,21 +184,31 @@ def plot_expression_survival(
             plot traces for. By default, no traces are shown.
         agents_for_phylogeny_trace: Agent IDs for the agents
             whose phylogenies will be traced.
+        survival_data: Data extracted by
+            :py:func:`get_expression_survival_data` from ``data`` with
+            the same variable paths and time range. If ``None``, it is
+            computed from ``data``.
 
     Returns:
         The finished figure.
     '''
-    live_finals_x, dead_finals_x = _calc_live_and_dead_finals(
-        data, path_to_x_variable, time_range, plot_agents)
-    live_finals_y, dead_finals_y = _calc_live_and_dead_finals(
-        data, path_to_y_variable, time_range, plot_agents)
+    if survival_data is None:
+        survival_data = get_expression_survival_data(
+            data, path_to_x_variable, path_to_y_variable, time_range)
+    live_finals_x = _select_agents(
+        survival_data.live_finals_x, plot_agents)
+    dead_finals_x = _select_agents(
+        survival_data.dead_finals_x, plot_agents)
+    live_finals_y = _select_agents(
+        survival_data.live_finals_y, plot_agents)
+    dead_finals_y = _select_agents(
+        survival_data.dead_finals_y, plot_agents)
     if label_agents:
         fig, ax = plt.subplots(figsize=(50, 50))
         # Always trace all agents when labeling
         dead_trace_agents = (
             list(dead_finals_x.keys()))
-        agents_for_phylogeny_trace = _get_final_live_agents(
-            data, time_range)
+        agents_for_phylogeny_trace = survival_data.final_live_agents
     else:
         fig, ax = plt.subplots(figsize=(6.4, 7))
 
@@ -149,10 +237,12 @@ def plot_expression_survival(
             ax.annotate(agent, (x, y), size=0.1)  # type: ignore
     plot_expression_survival_death_traces(
         ax, data, path_to_x_variable, path_to_y_variable, scaling,
-        time_range, dead_trace_agents, DEAD_COLOR)
+        time_range, dead_trace_agents, DEAD_COLOR,
+        survival_data.path_timeseries)
     plot_expression_survival_lineage_traces(
         ax, data, path_to_x_variable, path_to_y_variable, scaling,
-        time_range, agents_for_phylogeny_trace, LIVE_COLOR, ALPHA)
+        time_range, agents_for_phylogeny_trace, LIVE_COLOR, ALPHA,
+        survival_data.path_timeseries)
     finals = list(live_finals_x.values()) + list(
         dead_finals_x.values())
     plot_expression_survival_boundary(
@@ -201,9 +291,9 @@ def plot_expression_survival_boundary(
             intended to be used for changing the units plotted.
         boundary_color: Color of boundary.
     '''
-    boundary_x_arr = np.array(boundary_x)
-    boundary_y_arr = np.array(boundary_y)
-    boundary_error_arr = np.array(boundary_error)
+    boundary_x_arr = np.asarray(boundary_x)
+    boundary_y_arr = np.asarray(boundary_y)
+    boundary_error_arr = np.asarray(boundary_error)
     mask = (
         (min(finals) <= boundary_x_arr)
         & (boundary_x_arr <= max(finals)))
@@ -239,6 +329,7 @@ def plot_expression_survival_death_traces(
         time_range: Tuple[float, float] = (0, 1),
         dead_agents: Iterable[str] = tuple(),
         dead_trace_color: str = 'black',
+        path_timeseries: Optional[dict] = None,
         ) -> None:
     '''Create Expression Traces for Dead Cells
 
@@ -262,9 +353,12 @@ def plot_expression_survival_death_traces(
         dead_agents: The agent IDs of the agents to plot
             traces for. These agents should die.
         dead_trace_color: Color of trace line for dead cells.
+        path_timeseries: Path timeseries of ``data`` over
+            ``time_range``. If ``None``, it is computed from ``data``.
     '''
-    data = filter_raw_data_by_time(data, time_range)
-    path_timeseries = path_timeseries_from_data(data)
+    if path_timeseries is None:
+        data = filter_raw_data_by_time(data, time_range)
+        path_timeseries = path_timeseries_from_data(data)
 
     # Plot dead traces
     for i, agent in enumerate(dead_agents):
@@ -293,6 +387,7 @@ def plot_expression_survival_lineage_traces(
         agents_for_phylogeny_trace: Iterable[str] = tuple(),
         phylogeny_trace_color: str = 'green',
         alpha: float = 1,
+        path_timeseries: Optional[dict] = None,
         ) -> None:
     '''Create expression traces for a lineage of cells.
 
@@ -317,9 +412,12 @@ def plot_expression_survival_lineage_traces(
             whose phylogenies will be traced.
         phylogeny_trace_color (str): Color of trace line for phylogeny.
         alpha (float): Transparency for starting point.
+        path_timeseries (dict): Path timeseries of ``data`` over
+            ``time_range``. If ``None``, it is computed from ``data``.
     '''
-    data = filter_raw_data_by_time(data, time_range)
-    path_timeseries = path_timeseries_from_data(data)
+    if path_timeseries is None:
+        data = filter_raw_data_by_time(data, time_range)
+        path_timeseries = path_timeseries_from_data(data)
 
     # Plot phylogeny traces
     plotted_solid = False
@@ -447,7 +545,6 @@ def _calc_live_and_dead_finals(
         data: RawData,
         path_to_variable: Path,
         time_range: Tuple[float, float],
-        agents: Iterable[str] = tuple(),
         ) -> Tuple[Dict[str, float], Dict[str, float]]:
     values: Dict[str, Dict[float, float]] = {}
     die = set()
@@ -459,8 +556,6 @@ def _calc_live_and_dead_finals(
             continue
         agents_data = get_in(time_data, PATH_TO_AGENTS)
         for agent, agent_data in agents_data.items():
-            if agents and agent not in agents:
-                continue
             agent_values = values.setdefault(agent, {})
             value = get_in(agent_data, path_to_variable)
             if get_in(agent_data, PATH_TO_DEAD, False):
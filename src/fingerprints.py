@@ -0,0 +1,151 @@
+'''Detect figures whose inputs have not changed since they were made.
+
+Each generated figure has a fingerprint: a hash of the experiments,
+code, and other inputs used to generate it. The fingerprint is saved
+alongside the names of the files the figure wrote and its statistics,
+so a later run with the same fingerprint can skip the figure and reuse
+the saved statistics.
+'''
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+#: Directory containing this package's source code.
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_code_fingerprint(src_dir: str = SRC_DIR) -> str:
+    '''Get a hash of the source code used to generate figures.
+
+    Every Python file in ``src_dir`` is hashed, so uncommitted changes
+    to plotting helpers are detected too.
+
+    Args:
+        src_dir: Directory of source files to hash.
+
+    Returns:
+        Hex digest of the source files' names and contents.
+    '''
+    hasher = hashlib.blake2b()
+    for path in sorted(glob.glob(os.path.join(src_dir, '*.py'))):
+        hasher.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def hash_key(key: tuple) -> str:
+    '''Hash a tuple of figure inputs into a fingerprint.
+
+    Args:
+        key: Tuple of the inputs. Each input must have a deterministic
+            ``repr``.
+
+    Returns:
+        Hex digest of the inputs.
+    '''
+    return hashlib.blake2b(repr(key).encode()).hexdigest()
+
+
+def get_fingerprint_path(fingerprints_dir: str, name: str) -> str:
+    '''Get the path to the file recording a figure's fingerprint.'''
+    return os.path.join(fingerprints_dir, '{}.json'.format(name))
+
+
+def load_cached_stats(
+        path: str, fingerprint: str, out_dir: str) -> Optional[dict]:
+    '''Load the stats of a figure that is already up to date.
+
+    Args:
+        path: Path to the figure's saved fingerprint file.
+        fingerprint: The figure's current fingerprint.
+        out_dir: Directory the figure's files were written to.
+
+    Returns:
+        The stats saved when the figure was last generated, or ``None``
+        if the figure needs to be regenerated because it has no saved
+        fingerprint, the fingerprint has changed, or any of its output
+        files are missing.
+    '''
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        # Not orjson: saved stats can contain NaN and Infinity tokens
+        cached = json.load(f)
+    if cached['fingerprint'] != fingerprint:
+        return None
+    for filename in cached['files']:
+        if not os.path.exists(os.path.join(out_dir, filename)):
+            return None
+    return cached['stats']
+
+
+def get_mtimes(out_dir: str) -> Dict[str, int]:
+    '''Get the modification times of the files in a directory.
+
+    Args:
+        out_dir: Directory to scan. Subdirectories are ignored.
+
+    Returns:
+        Map from file name to modification time in nanoseconds.
+    '''
+    mtimes = {}
+    with os.scandir(out_dir) as entries:
+        for entry in entries:
+            if entry.is_file():
+                mtimes[entry.name] = entry.stat().st_mtime_ns
+    return mtimes
+
+
+def find_stale_figures(
+        fingerprints: Dict[str, str],
+        fingerprints_dir: str,
+        out_dir: str,
+        stats: dict,
+        ) -> Dict[str, str]:
+    '''Find the figures whose inputs have changed.
+
+    Args:
+        fingerprints: Map from the name of each requested figure to its
+            current fingerprint.
+        fingerprints_dir: Directory of saved fingerprint files.
+        out_dir: Directory the figures' files were written to.
+        stats: Dictionary to which the saved stats of each up-to-date
+            figure will be added, keyed by figure name.
+
+    Returns:
+        The subset of ``fingerprints`` for figures that need to be
+        regenerated, in the same order.
+    '''
+    stale = {}
+    for name, fingerprint in fingerprints.items():
+        cached_stats = load_cached_stats(
+            get_fingerprint_path(fingerprints_dir, name), fingerprint,
+            out_dir)
+        if cached_stats is None:
+            stale[name] = fingerprint
+        else:
+            print('Skipping up-to-date figure {}'.format(name))
+            stats[name] = cached_stats
+    return stale
+
+
+def get_written_files(
+        out_dir: str, mtimes_before: Dict[str, int]) -> List[str]:
+    '''Get the files written to a directory since a scan.
+
+    Args:
+        out_dir: Directory to scan.
+        mtimes_before: Modification times from :py:func:`get_mtimes`
+            before the files were written.
+
+    Returns:
+        Sorted names of the files that are new or have been modified.
+    '''
+    return sorted(
+        filename for filename, mtime in get_mtimes(out_dir).items()
+        if mtimes_before.get(filename) != mtime
+    )
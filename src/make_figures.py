@@ -3,18 +3,25 @@
 For usage information, run:
     python make_figures.py -h
 '''
+# Each figure has its own function here, so this module is long.
+# pylint: disable=too-many-lines
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+import hashlib
 import json
 import os
 import sys
 import subprocess
+import tempfile
 from typing import (
-    Sequence, List, Dict, Tuple, Union, Iterable, Optional, Set, cast)
+    Any, Callable, Sequence, List, Dict, Tuple, Union, Iterable,
+    Iterator, Optional, Set)
 
+from matplotlib import pyplot as plt
 from matplotlib import rcParams  # type: ignore
 import numpy as np
-from vivarium.core.serialize import serialize_value
+import orjson
 from vivarium.library.topology import get_in
 
 from src.db import (
@@ -24,12 +31,13 @@ from src.db import (
     get_experiment_data,
 )
 from src.expression_survival import (
+    get_expression_survival_data,
     plot_expression_survival,
     plot_expression_survival_dotplot,
 )
 from src.constants import OUT_DIR, FIELDS_PATH, BOUNDS_PATH
 from src.types import RawData, EnvironmentConfig, SearchData, DataTuple
-from src.total_mass import get_total_mass_plot
+from src.total_mass import get_total_mass_by_time, get_total_mass_plot
 from src.environment_cross_sections import (
     get_enviro_sections_plot, SerializedField)
 from src.phylogeny import plot_phylogeny
@@ -38,6 +46,9 @@ from src.process_expression_data import (
 from src.ridgeline import get_ridgeline_plot
 from src.plot_snapshots import plot_snapshots, plot_tags  # type: ignore
 from src.centrality import get_survival_against_centrality_plot
+from src.fingerprints import (
+    find_stale_figures, get_code_fingerprint, get_fingerprint_path,
+    get_mtimes, get_written_files, hash_key)
 
 
 # Colors from https://personal.sron.nl/~pault/#sec:qualitative
@@ -168,6 +179,19 @@ FIGURE_DESCRIPTIONS = {
 }
 METADATA_FILE = 'metadata.json'
 STATS_FILE = 'stats.json'
+FINGERPRINTS_DIR = 'fingerprints'
+# Constants that may be patched (e.g. by make_figures_test) and so need
+# to be copied into worker processes
+WORKER_CONSTANTS = (
+    'EXPERIMENT_IDS',
+    'FIG_OUT_DIR',
+    'ENVIRONMENT_SECTION_TIMES',
+    'AGENTS_TO_TRACE',
+    'AGENTS_FOR_PHYLOGENY_TRACE',
+    'FILE_EXTENSION',
+)
+FILE_EXTENSIONS = ('pdf', 'png', 'svg')
+SEARCH_DATA_ARRAY_KEYS = ('x_values', 'y_values', 'precision')
 
 
 def exec_shell(
@@ -186,6 +210,54 @@ def exec_shell(
     return proc.stdout.rstrip(), proc.stderr.rstrip()
 
 
+def _to_json_builtin(obj: object) -> object:
+    '''Convert a Numpy array or scalar to a JSON-serializable type.'''
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError('{} is not JSON serializable'.format(type(obj)))
+
+
+def write_json(path: str, obj: object) -> None:
+    '''Write an object to a JSON file.
+
+    Numpy arrays and scalars are written as lists and numbers, and
+    numeric keys are converted to strings. Not orjson: stats can be
+    NaN or infinite, which orjson would silently write as ``null``.
+
+    Args:
+        path: Path to the file to write.
+        obj: Object to serialize.
+    '''
+    with open(path, 'w') as f:
+        json.dump(obj, f, indent=4, default=_to_json_builtin)
+
+
+def parse_git_status(
+        status: str) -> Tuple[str, Optional[str], List[str]]:
+    '''Parse the output of ``git status --porcelain=v2 --branch``.
+
+    Args:
+        status: Output of the git command.
+
+    Returns:
+        Tuple of the hash of the current commit, the current branch
+        (``None`` if HEAD is detached), and the lines describing
+        changed and untracked files.
+    '''
+    headers = {}
+    entries = []
+    for line in status.splitlines():
+        if line.startswith('# '):
+            key, _, value = line[2:].partition(' ')
+            headers[key] = value
+        else:
+            entries.append(line)
+    branch = headers['branch.head']
+    if branch == '(detached)':
+        return headers['branch.oid'], None, entries
+    return headers['branch.oid'], branch, entries
+
+
 def get_metadata() -> dict:
     '''Get information on which experiments and code were used.'''
     if os.environ.get('CI'):
@@ -203,12 +275,12 @@ def get_metadata() -> dict:
             'experiment_ids': EXPERIMENT_IDS,
             'ci_url': ci_url,
         }
+    git_hash, git_branch, git_status = parse_git_status(exec_shell(
+        ['git', 'status', '--porcelain=v2', '--branch'])[0])
     return {
-        'git_hash': exec_shell(['git', 'rev-parse', 'HEAD'])[0],
-        'git_branch': exec_shell(
-            ['git', 'symbolic-ref', '--short', 'HEAD'])[0],
-        'git_status': exec_shell(
-            ['git', 'status', '--porcelain'])[0].split('\n'),
+        'git_hash': git_hash,
+        'git_branch': git_branch,
+        'git_status': git_status,
         'time': datetime.utcnow().isoformat() + '+00:00',
         'python': sys.version.splitlines()[0],
         'experiment_ids': EXPERIMENT_IDS,
@@ -218,20 +290,169 @@ def get_metadata() -> dict:
 def get_experiment_ids(
         id_obj: Union[str, Tuple[str, ...], List[str], Set[str], dict]
         ) -> List[str]:
-    '''Get a flat list of all experiment IDs. May have duplicates.'''
-    if isinstance(id_obj, str):
-        return [id_obj]
-    if isinstance(id_obj, (tuple, list, set)):
-        ids_lst = []
-        for elem in id_obj:
-            ids_lst.extend(get_experiment_ids(elem))
-        return ids_lst
-    if isinstance(id_obj, dict):
-        ids_lst = []
-        for elem in id_obj.values():
-            ids_lst.extend(get_experiment_ids(elem))
-        return ids_lst
-    return id_obj
+    '''Get a flat list of all unique experiment IDs.
+
+    IDs are returned in the order they are first encountered in a
+    depth-first traversal of ``id_obj``.
+    '''
+    ids_lst: List[str] = []
+    seen: Set[str] = set()
+    stack: list = [id_obj]
+    while stack:
+        elem = stack.pop()
+        if isinstance(elem, str):
+            if elem not in seen:
+                seen.add(elem)
+                ids_lst.append(elem)
+        elif isinstance(elem, (tuple, list, set)):
+            # Reverse so children are popped in their original order
+            stack.extend(reversed(list(elem)))
+        elif isinstance(elem, dict):
+            stack.extend(reversed(list(elem.values())))
+        else:
+            raise ValueError(
+                'Experiment ID object %s of unsupported type %s' %
+                (elem, type(elem)),
+            )
+    return ids_lst
+
+
+def count_experiment_consumers(
+        figure_names: Iterable[str]) -> Dict[str, int]:
+    '''Count how many of a set of figures use each experiment.
+
+    Args:
+        figure_names: Names of the figures that will be generated. Each
+            name must be a key in ``EXPERIMENT_IDS``.
+
+    Returns:
+        Map from experiment ID to the number of figures in
+        ``figure_names`` that need that experiment's data.
+    '''
+    consumers: Dict[str, int] = {}
+    for fig_name in figure_names:
+        for experiment_id in get_experiment_ids(
+                EXPERIMENT_IDS[fig_name]):
+            consumers[experiment_id] = consumers.get(
+                experiment_id, 0) + 1
+    return consumers
+
+
+def check_times_present(
+        sorted_times: np.ndarray, times: np.ndarray) -> None:
+    '''Check that all of a set of times are present in a simulation.
+
+    Args:
+        sorted_times: Sorted array of the simulation's timepoints.
+        times: Times to look for.
+
+    Raises:
+        ValueError: If any of ``times`` is not in ``sorted_times``.
+    '''
+    indices = np.searchsorted(sorted_times, times)
+    indices = np.minimum(indices, len(sorted_times) - 1)
+    missing = times[sorted_times[indices] != times]
+    if missing.size:
+        raise ValueError(
+            'Times {} not found in simulation data'.format(
+                missing.tolist()))
+
+
+def get_data_source_key(
+        args: argparse.Namespace, experiment_ids: List[str]) -> tuple:
+    '''Describe where a figure's experiment data is read from.
+
+    Args:
+        args: Parsed CLI args.
+        experiment_ids: IDs of the experiments the figure uses.
+
+    Returns:
+        If ``args.data_path`` is set, the path, size, and modification
+        time of each experiment's JSON file (``None`` for missing
+        files). Otherwise, the MongoDB host, port, and database name.
+    '''
+    if not args.data_path:
+        return (args.host, args.port, args.database_name)
+    key: List[tuple] = []
+    for experiment_id in experiment_ids:
+        path = os.path.abspath(os.path.join(
+            args.data_path, '{}.json'.format(experiment_id)))
+        if os.path.exists(path):
+            stat = os.stat(path)
+            key.append((path, stat.st_size, stat.st_mtime_ns))
+        else:
+            key.append((path, None))
+    return tuple(key)
+
+
+def get_figure_fingerprint(
+        fig_name: str, code_fingerprint: str, search_data: bytes,
+        data_source: tuple,
+        ) -> str:
+    '''Get a hash of all the inputs used to generate a figure.
+
+    Args:
+        fig_name: Name of the figure, a key in ``EXPERIMENT_IDS``.
+        code_fingerprint: Hash of the source code from
+            :py:func:`src.fingerprints.get_code_fingerprint`.
+        search_data: Contents of the boundary search data file.
+        data_source: Where the experiment data is read from, from
+            :py:func:`get_data_source_key`.
+
+    Returns:
+        Hex digest of the figure's experiments and their data source,
+        the code, the search data, the configured times and agents,
+        and the file format.
+    '''
+    return hash_key((
+        fig_name,
+        EXPERIMENT_IDS[fig_name],
+        data_source,
+        ENVIRONMENT_SECTION_TIMES,
+        AGENTS_TO_TRACE,
+        AGENTS_FOR_PHYLOGENY_TRACE,
+        FILE_EXTENSION,
+        code_fingerprint,
+        hashlib.blake2b(search_data).hexdigest(),
+    ))
+
+
+def get_figure_filename(name: str) -> str:
+    '''Get the name of the file a figure is saved to.
+
+    Args:
+        name: Name of the figure, excluding file extension.
+
+    Returns:
+        The file name, with ``FILE_EXTENSION`` appended.
+    '''
+    return f'{name}.{FILE_EXTENSION}'
+
+
+def get_figure_path(name: str) -> str:
+    '''Get the path a figure is saved to under ``FIG_OUT_DIR``.
+
+    Args:
+        name: Name of the figure, excluding file extension.
+
+    Returns:
+        The path to the figure file.
+    '''
+    return os.path.join(FIG_OUT_DIR, get_figure_filename(name))
+
+
+def save_figure(fig: plt.Figure, name: str) -> None:
+    '''Save a figure to ``FIG_OUT_DIR`` and close it.
+
+    Closing the figure frees its canvas so that figures do not pile up
+    in memory over a run.
+
+    Args:
+        fig: The figure to save.
+        name: Name of the output file (excluding file extension).
+    '''
+    fig.savefig(get_figure_path(name))
+    plt.close(fig)
 
 
 def make_snapshots_figure(
@@ -273,7 +494,7 @@ def make_snapshots_figure(
         })
     plot_config = {
         'out_dir': FIG_OUT_DIR,
-        'filename': '{}.{}'.format(name, FILE_EXTENSION),
+        'filename': get_figure_filename(name),
         'include_fields': fields,
         'field_label_size': 54,
         'default_font_size': 54,
@@ -295,6 +516,33 @@ def make_snapshots_figure(
     return stats
 
 
+def make_replicate_snapshots_figures(
+        replicates_data: Iterable[DataTuple],
+        name: str,
+        fields: Sequence[str],
+        agent_fill_color: Optional[str] = None,
+        ) -> dict:
+    '''Make a snapshots figure for each replicate.
+
+    Args:
+        replicates_data: The data and environment config of each
+            replicate.
+        name: Prefix of the output file names. The figure for the
+            replicate at index ``i`` is saved as ``<name>_<i>``.
+        fields: List of the names of fields to include.
+        agent_fill_color: Fill color for agents.
+
+    Returns:
+        Map from replicate index to that replicate's statistics.
+    '''
+    stats = {}
+    for i, (data, enviro_config) in enumerate(replicates_data):
+        stats[i] = make_snapshots_figure(
+            data, enviro_config, '{}_{}'.format(name, i), fields,
+            agent_fill_color)
+    return stats
+
+
 def make_expression_heterogeneity_fig(
         replicates_data: Iterable[DataTuple],
         _: SearchData,
@@ -310,8 +558,8 @@ def make_expression_heterogeneity_fig(
             'out_dir': FIG_OUT_DIR,
             'tagged_molecules': tagged_molecules,
             'background_color': 'white',
-            'filename': 'expression_heterogeneity_{}.{}'.format(
-               i, FILE_EXTENSION),
+            'filename': get_figure_filename(
+                'expression_heterogeneity_{}'.format(i)),
             'tag_path_name_map': TAG_PATH_NAME_MAP,
             'tag_label_size': 54,
             'default_font_size': 48,
@@ -337,23 +585,28 @@ def _calculate_distribution_stats(
     for replicate, _ in replicates_data:
         assert replicate.keys() == keys
     for key in keys:
-        num_cells = 0
-        key_replicates = []
-        for replicate, _ in replicates_data:
-            key_replicates.append(replicate[key])
-            num_cells += len(replicate[key])
-        key_replicates_array = np.array(key_replicates)  # type: ignore
-        q1, q2, q3 = np.percentile(
+        key_replicates_array = np.empty(
+            (len(replicates_data), len(replicates_data[0][0][key])),
+            dtype=np.float64)
+        for i, (replicate, _) in enumerate(replicates_data):
+            key_replicates_array[i] = replicate[key]
+        num_zeros = (key_replicates_array == 0).sum()
+        mins = key_replicates_array.min(axis=1)
+        maxes = key_replicates_array.max(axis=1)
+        # The array is only used for the quartiles from here on, so
+        # let numpy partition it in place instead of copying it.
+        q1, q2, q3 = np.quantile(
             key_replicates_array,
-            [25, 50, 75],
+            [0.25, 0.5, 0.75],
             axis=1,
+            overwrite_input=True,
         )
         stats[key] = (
-            (key_replicates_array == 0).sum(),
-            key_replicates_array.min(axis=1),  # type: ignore
+            num_zeros,
+            mins,
             q1, q2, q3,
-            key_replicates_array.max(axis=1),  # type: ignore
-            num_cells,
+            maxes,
+            key_replicates_array.size,
         )
     return stats
 
@@ -391,17 +644,12 @@ def make_expression_distributions_fig(
         y_label='Distribution Density',
         fontsize=14,
     )
-    fig.savefig(
-        os.path.join(
-            FIG_OUT_DIR,
-            'expression_distributions.{}'.format(FILE_EXTENSION),
-        )
-    )
+    save_figure(fig, 'expression_distributions')
     return stats
 
 
 def make_growth_fig(
-        raw_data: Dict[str, DataTuple],
+        total_masses: Dict[str, Tuple[Dict[float, float], ...]],
         _: SearchData,
         ) -> dict:
     '''Make plot of colony mass of basal and anaerobic colonies.
@@ -409,30 +657,27 @@ def make_growth_fig(
     Create Figure 3E.
     '''
     data_dict = {
-        'basal': [data for data, _ in raw_data['basal']],
-        'anaerobic': [data for data, _ in raw_data['anaerobic']],
+        'basal': list(total_masses['basal']),
+        'anaerobic': list(total_masses['anaerobic']),
     }
     fig, stats = get_total_mass_plot(
         data_dict, list(COLORS.values()), fontsize=12)
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR, 'growth.{}'.format(FILE_EXTENSION)))
+    save_figure(fig, 'growth')
     return stats
 
 
 def make_threshold_scan_fig(
-        data_and_configs: Dict[str, DataTuple],
+        total_masses: Dict[str, Tuple[Dict[float, float], ...]],
         _: SearchData,
         ) -> dict:
     '''Plot colony mass curves with various antibiotic thresholds.
 
     Create Figure 5A.
     '''
-    data_dict = dict({
-        threshold: list(
-            data for data, enviro_config in threshold_ids
-        )
-        for threshold, threshold_ids in data_and_configs.items()
-    })
+    data_dict = {
+        threshold: list(threshold_masses)
+        for threshold, threshold_masses in total_masses.items()
+    }
     some_data = list(data_dict.values())[0][0]
     vlines = (
         (
@@ -445,8 +690,7 @@ def make_threshold_scan_fig(
     fig, stats = get_total_mass_plot(
         data_dict, list(COLORS.values()), fontsize=12, vlines=vlines,
     )
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR, 'threshold_scan.{}'.format(FILE_EXTENSION)))
+    save_figure(fig, 'threshold_scan')
     return stats
 
 
@@ -459,6 +703,9 @@ def make_expression_survival_fig(
     Create Figures 5G, 5H, and 5I.
     '''
     data, _ = data_and_config
+    survival_data = get_expression_survival_data(
+        data, PUMP_PATH, BETA_LACTAMASE_PATH,
+        EXPRESSION_SURVIVAL_TIME_RANGE)
     fig = plot_expression_survival(
         data, PUMP_PATH, BETA_LACTAMASE_PATH,
         'Final [AcrAB-TolC] (µM)',
@@ -470,11 +717,9 @@ def make_expression_survival_fig(
         scaling=1e3,
         time_range=EXPRESSION_SURVIVAL_TIME_RANGE,
         fontsize=12,
+        survival_data=survival_data,
     )
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR, 'expression_survival.{}'.format(
-            FILE_EXTENSION)
-    ))
+    save_figure(fig, 'expression_survival')
     plot_agents = set()
     for agent in AGENTS_FOR_PHYLOGENY_TRACE:
         for i in range(len('0_wcecoli') + 1, len(agent) + 1):
@@ -492,11 +737,9 @@ def make_expression_survival_fig(
         plot_agents=plot_agents,
         agents_for_phylogeny_trace=AGENTS_FOR_PHYLOGENY_TRACE,
         fontsize=12,
+        survival_data=survival_data,
     )
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR, 'expression_survival_lineage_traces.{}'.format(
-            FILE_EXTENSION)
-    ))
+    save_figure(fig, 'expression_survival_lineage_traces')
     fig = plot_expression_survival(
         data, PUMP_PATH, BETA_LACTAMASE_PATH,
         '[AcrAB-TolC] (µM)',
@@ -510,11 +753,9 @@ def make_expression_survival_fig(
         dead_trace_agents=AGENTS_TO_TRACE,
         plot_agents=AGENTS_TO_TRACE,
         fontsize=12,
+        survival_data=survival_data,
     )
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR, 'expression_survival_death_traces.{}'.format(
-            FILE_EXTENSION)
-    ))
+    save_figure(fig, 'expression_survival_death_traces')
     fig = plot_expression_survival(
         data, PUMP_PATH, BETA_LACTAMASE_PATH,
         'Final [AcrAB-TolC] (µM)',
@@ -527,11 +768,9 @@ def make_expression_survival_fig(
         time_range=EXPRESSION_SURVIVAL_TIME_RANGE,
         label_agents=True,
         fontsize=12,
+        survival_data=survival_data,
     )
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR, 'expression_survival_labeled.{}'.format(
-            FILE_EXTENSION)
-    ))
+    save_figure(fig, 'expression_survival_labeled')
     return {}
 
 
@@ -551,19 +790,14 @@ def make_expression_survival_dotplots(
         time_range=EXPRESSION_SURVIVAL_TIME_RANGE,
         fontsize=12,
     )
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR, 'expression_survival_pump.{}'.format(
-            FILE_EXTENSION)))
+    save_figure(fig, 'expression_survival_pump')
     fig, stats['AmpC'] = plot_expression_survival_dotplot(
         data, BETA_LACTAMASE_PATH, 'Final [AmpC] (µM)',
         scaling=1e3,
         time_range=EXPRESSION_SURVIVAL_TIME_RANGE,
         fontsize=12,
     )
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR,
-        'expression_survival_beta_lactamase.{}'.format(
-            FILE_EXTENSION)))
+    save_figure(fig, 'expression_survival_beta_lactamase')
     return stats
 
 
@@ -577,10 +811,7 @@ def make_survival_centrality_fig(
     '''
     data, _ = data_and_config
     fig, stats = get_survival_against_centrality_plot(data)
-    fig.savefig(os.path.join(
-        FIG_OUT_DIR,
-        'survival_centrality.{}'.format(FILE_EXTENSION)
-    ))
+    save_figure(fig, 'survival_centrality')
     return stats
 
 
@@ -592,25 +823,27 @@ def make_environment_section(
 
     Create Figure 3B.
     '''
-    t_final = max(data_and_configs[0][0].keys())
+    sorted_times = [
+        np.array(sorted(replicate.keys()))
+        for replicate, _ in data_and_configs
+    ]
+    t_final = sorted_times[0][-1]
     fields_ts: List[Dict[float, Dict[str, SerializedField]]] = []
-    section_times = [
-        float(time) for time in ENVIRONMENT_SECTION_TIMES]
+    section_times = np.array(ENVIRONMENT_SECTION_TIMES, dtype=float)
+    section_fields = frozenset(ENVIRONMENT_SECTION_FIELDS)
     for i, (replicate, _) in enumerate(data_and_configs):
+        check_times_present(sorted_times[i], section_times)
         fields_ts.append(dict())
-        for time in section_times:
+        for time in section_times.tolist():
+            fields = get_in(replicate[time], FIELDS_PATH)
             fields_ts[i][time] = {
-                name: field
-                for name, field in get_in(
-                    replicate[time], FIELDS_PATH).items()
-                if name in ENVIRONMENT_SECTION_FIELDS
+                name: fields[name]
+                for name in fields.keys() & section_fields
             }
     bounds = get_in(data_and_configs[0][0][t_final], BOUNDS_PATH)
     fig, stats = get_enviro_sections_plot(
         fields_ts, bounds, section_location=0.5, fontsize=18)
-    fig.savefig(
-        os.path.join(FIG_OUT_DIR, 'enviro_section.{}'.format(
-            FILE_EXTENSION)))
+    save_figure(fig, 'enviro_section')
     return stats
 
 
@@ -622,11 +855,8 @@ def make_growth_basal_fig(
 
     Create Figure 3C.
     '''
-    stats = {}
-    for i, (data, enviro_config) in enumerate(replicates_data):
-        stats[i] = make_snapshots_figure(
-            data, enviro_config, 'growth_basal_{}'.format(i), [])
-    return stats
+    return make_replicate_snapshots_figures(
+        replicates_data, 'growth_basal', [])
 
 
 def make_growth_anaerobic_fig(
@@ -637,11 +867,8 @@ def make_growth_anaerobic_fig(
 
     Create Figure 3D.
     '''
-    stats = {}
-    for i, (data, enviro_config) in enumerate(replicates_data):
-        stats[i] = make_snapshots_figure(
-            data, enviro_config, 'growth_anaerobic_{}'.format(i), [])
-    return stats
+    return make_replicate_snapshots_figures(
+        replicates_data, 'growth_anaerobic', [])
 
 
 def make_phylogeny_plot(
@@ -653,8 +880,8 @@ def make_phylogeny_plot(
     Create Figure 5D.
     '''
     data, _ = data_and_config
-    tree, df = plot_phylogeny(data, os.path.join(
-        FIG_OUT_DIR, 'phylogeny.{}').format(FILE_EXTENSION),
+    tree, df = plot_phylogeny(
+        data, get_figure_path('phylogeny'),
         time_range=EXPRESSION_SURVIVAL_TIME_RANGE)
     tree.write(
         format=1,
@@ -675,13 +902,9 @@ def make_enviro_heterogeneity_fig(
 
     Create Figure 5A.
     '''
-    stats = {}
-    for i, (data, enviro_config) in enumerate(replicates_data):
-        stats[i] = make_snapshots_figure(
-            data, enviro_config, 'enviro_heterogeneity_{}'.format(i),
-            ENVIRONMENT_SECTION_FIELDS, 'white',
-        )
-    return stats
+    return make_replicate_snapshots_figures(
+        replicates_data, 'enviro_heterogeneity',
+        ENVIRONMENT_SECTION_FIELDS, 'white')
 
 
 def make_death_snapshots(
@@ -722,18 +945,18 @@ def make_death_snapshots_antibiotic(
 
 
 def create_data_dict(
-        all_data: Dict[str, DataTuple],
+        all_data: Dict[str, Any],
         experiment_id_obj: Union[dict, str, Tuple[str, ...]],
-        ) -> Union[dict, DataTuple, Tuple[DataTuple, ...]]:
+        ) -> Any:
     '''Create a dictionary of experiment simulation data.
 
     Note that we only support tuples of IDs, not tuples of dictionaries
     or tuples of tuples.
 
     Args:
-        all_data (dict(str, tuple(RawData, dict))): Map from experiment
-            ID to that experiment's simulation data and environment
-            config.
+        all_data (dict(str, Any)): Map from experiment ID to that
+            experiment's data, usually a tuple of its simulation data
+            and environment config.
         experiment_id_obj (Union(dict, str, tuple)): Object with one or
             more experiment IDs. The returned data object will have the
             same shape as this object. Dictionaries, strings, and tuples
@@ -747,8 +970,7 @@ def create_data_dict(
         to_return = []
         for elem in experiment_id_obj:
             assert isinstance(elem, str)
-            data_tuple = create_data_dict(all_data, elem)
-            to_return.append(cast(DataTuple, data_tuple))
+            to_return.append(create_data_dict(all_data, elem))
         return tuple(to_return)
     if isinstance(experiment_id_obj, dict):
         return dict({
@@ -761,6 +983,94 @@ def create_data_dict(
     )
 
 
+def release_experiment(
+        experiment_id: str,
+        data_cache: Dict[str, DataTuple],
+        consumers: Dict[str, int],
+        ) -> None:
+    '''Record that a figure is done with an experiment's data.
+
+    The data is removed from ``data_cache`` once no remaining figure
+    needs it.
+
+    Args:
+        experiment_id: ID of the experiment.
+        data_cache: Map from experiment ID to loaded data.
+        consumers: Map from experiment ID to the number of remaining
+            figures that need that experiment, from
+            :py:func:`count_experiment_consumers`.
+    '''
+    consumers[experiment_id] -= 1
+    if consumers[experiment_id] == 0:
+        del data_cache[experiment_id]
+
+
+def load_figure_data(
+        args: argparse.Namespace,
+        experiment_ids: Iterable[str],
+        data_cache: Dict[str, DataTuple],
+        consumers: Dict[str, int],
+        reducer: Optional[Callable[[DataTuple], Any]] = None,
+        ) -> Dict[str, Any]:
+    '''Load the data for each experiment a figure needs.
+
+    Experiments are loaded into ``data_cache`` unless they are already
+    there. If ``reducer`` is given, each experiment is reduced as soon
+    as it is loaded and then released with
+    :py:func:`release_experiment`, so at most one of the figure's full
+    experiments is held in memory at a time.
+
+    Args:
+        args: Parsed CLI args.
+        experiment_ids: IDs of the experiments the figure needs.
+        data_cache: Map from experiment ID to loaded data.
+        consumers: Map from experiment ID to the number of remaining
+            figures that need that experiment.
+        reducer: Function that extracts what the figure needs from an
+            experiment's data.
+
+    Returns:
+        Map from experiment ID to that experiment's data, or to its
+        reduced data if ``reducer`` is given.
+    '''
+    figure_data = {}
+    for experiment_id in experiment_ids:
+        if experiment_id not in data_cache:
+            data_cache[experiment_id] = get_experiment_data(
+                args, experiment_id)
+        if reducer is None:
+            figure_data[experiment_id] = data_cache[experiment_id]
+        else:
+            figure_data[experiment_id] = reducer(
+                data_cache[experiment_id])
+            release_experiment(experiment_id, data_cache, consumers)
+    return figure_data
+
+
+def reduce_to_total_mass(
+        data_and_config: DataTuple) -> Dict[float, float]:
+    '''Reduce an experiment to its total mass at each timepoint.'''
+    data, _ = data_and_config
+    return get_total_mass_by_time(data)
+
+
+def reduce_to_environment_sections(
+        data_and_config: DataTuple) -> DataTuple:
+    '''Reduce an experiment to the timepoints enviro_section plots.
+
+    Only the timepoints in ``ENVIRONMENT_SECTION_TIMES`` and the final
+    timepoint are kept.
+    '''
+    data, config = data_and_config
+    keep_times = set(ENVIRONMENT_SECTION_TIMES)
+    keep_times.add(max(data.keys()))
+    reduced = RawData({
+        time: timepoint for time, timepoint in data.items()
+        if time in keep_times
+    })
+    return reduced, config
+
+
 FIGURE_FUNCTION_MAP = {
     'expression_distributions': make_expression_distributions_fig,
     'expression_heterogeneity': make_expression_heterogeneity_fig,
@@ -777,16 +1087,147 @@ FIGURE_FUNCTION_MAP = {
     'death_snapshots_antibiotic': make_death_snapshots_antibiotic,
     'centrality': make_survival_centrality_fig,
 }
+# Figures that only need a small part of each experiment's data. The
+# reducer extracts that part as each experiment is loaded so that the
+# full data can be freed before the next experiment is loaded.
+FIGURE_DATA_REDUCERS: Dict[str, Callable[[DataTuple], Any]] = {
+    'growth': reduce_to_total_mass,
+    'threshold_scan': reduce_to_total_mass,
+    'enviro_section': reduce_to_environment_sections,
+}
 
 
-def main() -> None:
-    '''Generate all figures.'''
+def set_plot_style() -> None:
+    '''Set the Matplotlib style shared by all figures.'''
     rcParams['font.sans-serif'] = ['Arial']
     rcParams['font.family'] = ['sans-serif']
+
+
+def generate_figures(
+        args: argparse.Namespace,
+        figure_names: Sequence[str],
+        search_data: SearchData,
+        ) -> Iterator[Tuple[str, dict, List[str]]]:
+    '''Generate figures one after another in this process.
+
+    Each experiment is loaded once and freed after the last figure
+    that needs it.
+
+    Args:
+        args: Parsed CLI args.
+        figure_names: Names of the figures to generate.
+        search_data: Boundary search data.
+
+    Yields:
+        For each figure, a tuple of the figure name, its stats, and the
+        names of the files it wrote to ``FIG_OUT_DIR``.
+    '''
+    data_cache: Dict[str, DataTuple] = {}
+    consumers = count_experiment_consumers(figure_names)
+    for fig_name in figure_names:
+        experiment_ids = EXPERIMENT_IDS[fig_name]
+        fig_experiment_ids = get_experiment_ids(experiment_ids)
+        reducer = FIGURE_DATA_REDUCERS.get(fig_name)
+        data = create_data_dict(
+            load_figure_data(
+                args, fig_experiment_ids, data_cache, consumers,
+                reducer),
+            experiment_ids)
+        func = FIGURE_FUNCTION_MAP[fig_name]
+        mtimes_before = get_mtimes(FIG_OUT_DIR)
+        stats = func(data, search_data)  # type: ignore
+        del data
+        # Free each experiment's data once no later figure needs it
+        if reducer is None:
+            for experiment_id in fig_experiment_ids:
+                release_experiment(experiment_id, data_cache, consumers)
+        yield fig_name, stats, get_written_files(
+            FIG_OUT_DIR, mtimes_before)
+
+
+def _init_worker(constants: Dict[str, Any]) -> None:
+    '''Set up a worker process to generate figures.
+
+    Args:
+        constants: Map from the name of each constant in
+            ``WORKER_CONSTANTS`` to its value in the parent process,
+            where it may have been patched.
+    '''
+    globals().update(constants)
+    set_plot_style()
+
+
+def _generate_figure_in_worker(
+        args: argparse.Namespace,
+        fig_name: str,
+        search_data: SearchData,
+        ) -> Tuple[str, dict, List[str]]:
+    '''Generate a single figure in a worker process.
+
+    The figure is written to a temporary directory and then moved into
+    ``FIG_OUT_DIR`` so that the files each figure writes can be told
+    apart while other workers are writing theirs.
+    '''
+    global FIG_OUT_DIR  # pylint: disable=global-statement
+    out_dir = FIG_OUT_DIR
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp_dir:
+        FIG_OUT_DIR = tmp_dir
+        try:
+            _, stats, written_files = next(generate_figures(
+                args, [fig_name], search_data))
+        finally:
+            FIG_OUT_DIR = out_dir
+        for filename in written_files:
+            os.replace(
+                os.path.join(tmp_dir, filename),
+                os.path.join(out_dir, filename))
+    return fig_name, stats, written_files
+
+
+def generate_figures_in_parallel(
+        args: argparse.Namespace,
+        figure_names: Sequence[str],
+        search_data: SearchData,
+        processes: int,
+        ) -> Iterator[Tuple[str, dict, List[str]]]:
+    '''Generate figures in a pool of worker processes.
+
+    Each figure is a separate task that loads its own experiments, so
+    experiments shared between figures are loaded once per figure, and
+    up to ``processes`` figures' data are in memory at once.
+
+    Args:
+        args: Parsed CLI args.
+        figure_names: Names of the figures to generate.
+        search_data: Boundary search data.
+        processes: Number of worker processes.
+
+    Yields:
+        The same tuples as :py:func:`generate_figures`, in the order
+        the figures finish.
+    '''
+    constants = {name: globals()[name] for name in WORKER_CONSTANTS}
+    with ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker,
+            initargs=(constants,)) as executor:
+        futures = [
+            executor.submit(
+                _generate_figure_in_worker, args, fig_name,
+                search_data)
+            for fig_name in figure_names
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main() -> None:
+    '''Generate all figures.'''
+    # The format is read from FILE_EXTENSION when figures are saved
+    global FILE_EXTENSION  # pylint: disable=global-statement
+    set_plot_style()
     if not os.path.exists(FIG_OUT_DIR):
         os.makedirs(FIG_OUT_DIR)
-    with open(os.path.join(FIG_OUT_DIR, METADATA_FILE), 'w') as f:
-        json.dump(get_metadata(), f, indent=4)
+    write_json(os.path.join(FIG_OUT_DIR, METADATA_FILE), get_metadata())
     stats: dict = {}
     parser = argparse.ArgumentParser(
         description=(
@@ -815,35 +1256,89 @@ def main() -> None:
         action='store_true',
         help='Generate all figures and stats.',
     )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Regenerate figures even if their inputs are unchanged.',
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help=(
+            'Number of figures to generate in parallel. Each process '
+            'loads its own copy of the experiments it needs, so this '
+            'multiplies memory use. Defaults to 1.'
+        ),
+    )
+    parser.add_argument(
+        '--format',
+        choices=FILE_EXTENSIONS,
+        default=FILE_EXTENSION,
+        help=(
+            'File format to save figures in. PNG can be faster to '
+            'save than PDF when snapshots have many cells. Defaults '
+            'to "{}".'.format(FILE_EXTENSION)
+        ),
+    )
     args = parser.parse_args()
     args_dict = vars(args)
+    FILE_EXTENSION = args.format
+
+    with open(args.search_data, 'rb') as f:
+        search_data_bytes = f.read()
+    # Convert the boundary to arrays once here instead of in every plot
+    search_data = SearchData({
+        key: (
+            np.asarray(value, dtype=float)
+            if key in SEARCH_DATA_ARRAY_KEYS else value
+        )
+        for key, value in orjson.loads(search_data_bytes).items()
+    })
 
-    with open(args.search_data, 'r') as f:
-        search_data = json.load(f)
-
-    data_cache = {}
-    generated_figures = set()
-    stats = {}
-
+    figures_to_generate: List[str] = []
     for fig, fig_dict in FIGURE_NUMBER_NAME_MAP.items():
         for panel, fig_name in fig_dict.items():
             if not (args_dict['{}{}'.format(fig, panel)] or args.all):
                 continue
-            if fig_name in generated_figures:
+            if fig_name in figures_to_generate:
                 continue
-            generated_figures.add(fig_name)
-            experiment_ids = EXPERIMENT_IDS[fig_name]
-            for experiment_id in get_experiment_ids(experiment_ids):
-                if experiment_id in data_cache:
-                    continue
-                data_cache[experiment_id] = get_experiment_data(
-                    args, experiment_id)
-            data = create_data_dict(data_cache, experiment_ids)
-            func = FIGURE_FUNCTION_MAP[fig_name]
-            stats[fig_name] = func(data, search_data)  # type: ignore
-
-    with open(os.path.join(FIG_OUT_DIR, STATS_FILE), 'w') as f:
-        json.dump(serialize_value(stats), f, indent=4)
+            figures_to_generate.append(fig_name)
+
+    stats = {}
+    code_fingerprint = get_code_fingerprint()
+    fingerprints = {
+        fig_name: get_figure_fingerprint(
+            fig_name, code_fingerprint, search_data_bytes,
+            get_data_source_key(
+                args, get_experiment_ids(EXPERIMENT_IDS[fig_name])))
+        for fig_name in figures_to_generate
+    }
+    fingerprints_dir = os.path.join(FIG_OUT_DIR, FINGERPRINTS_DIR)
+    if not args.force:
+        fingerprints = find_stale_figures(
+            fingerprints, fingerprints_dir, FIG_OUT_DIR, stats)
+    os.makedirs(fingerprints_dir, exist_ok=True)
+
+    if args.processes > 1:
+        results = generate_figures_in_parallel(
+            args, list(fingerprints), search_data, args.processes)
+    else:
+        results = generate_figures(
+            args, list(fingerprints), search_data)
+    for fig_name, fig_stats, written_files in results:
+        stats[fig_name] = fig_stats
+        # Record the fingerprint along with the files and stats the
+        # figure produced so that later runs can skip it
+        write_json(get_fingerprint_path(fingerprints_dir, fig_name), {
+            'fingerprint': fingerprints[fig_name],
+            'files': written_files,
+            'stats': fig_stats,
+        })
+
+    write_json(os.path.join(FIG_OUT_DIR, STATS_FILE), {
+        fig_name: stats[fig_name] for fig_name in figures_to_generate
+    })
 
 
 if __name__ == '__main__':
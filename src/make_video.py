@@ -4,14 +4,21 @@ For usage information, run:
     python make_video.py -h
 '''
 import argparse
+from collections import Counter
 import os
+from typing import Dict, cast
 
 from matplotlib import rcParams  # type: ignore
 
 from src.constants import OUT_DIR
 from src.db import add_connection_args, get_experiment_data
-from src.snapshots_video import make_tags_video, make_snapshots_video
+from src.snapshots_video import (
+    ENCODER_OPTIONS,
+    make_tags_video,
+    make_snapshots_video,
+)
 from src.make_figures import TAG_PATH_NAME_MAP
+from src.types import DataTuple
 
 
 FIG_OUT_DIR = os.path.join(OUT_DIR, 'figs')
@@ -72,26 +79,58 @@ def main() -> None:
         default='',
         help='Folder of JSON files to read data from instead of Mongo',
     )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=1,
+        help=(
+            'Number of video frames to plot in parallel. Defaults to '
+            '1.'
+        ),
+    )
+    parser.add_argument(
+        '--codec',
+        default='libx264',
+        choices=ENCODER_OPTIONS,
+        help=(
+            'H.264 encoder for FFmpeg to use. h264_nvenc encodes on an '
+            'NVIDIA GPU and falls back to libx264 if FFmpeg lacks it. '
+            'Defaults to libx264.'
+        ),
+    )
     args = parser.parse_args()
-    for config  in VIDEO_CONFIGS:
-        data, environment_config = get_experiment_data(
-            args, config['experiment_id'])
+    # Several videos come from the same experiment, so load each
+    # experiment once and free it after its last video
+    consumers = Counter(
+        config['experiment_id'] for config in VIDEO_CONFIGS)
+    data_cache: Dict[str, DataTuple] = {}
+    for config in VIDEO_CONFIGS:
+        experiment_id = cast(str, config['experiment_id'])
+        if experiment_id not in data_cache:
+            data_cache[experiment_id] = get_experiment_data(
+                args, experiment_id)
+        data, environment_config = data_cache[experiment_id]
         if config['video_type'] == 'snapshots':
             make_snapshots_video(
                 data, environment_config, [config['field']],
                 filename=config['name'], out_dir=FIG_OUT_DIR,
                 field_added=float(config['field_added']), xlim=(10, 40),
-                ylim=(10, 40),
+                ylim=(10, 40), processes=args.processes,
+                codec=args.codec,
             )
         elif config['video_type'] == 'tags':
             make_tags_video(
                 data, environment_config, [config['tag']],
                 TAG_PATH_NAME_MAP, filename=config['name'],
                 out_dir=FIG_OUT_DIR, xlim=(10, 40), ylim=(10, 40),
+                processes=args.processes, codec=args.codec,
             )
         else:
             raise ValueError(
                 'Unknown video type {}'.format(config['video_type']))
+        consumers[experiment_id] -= 1
+        if consumers[experiment_id] == 0:
+            del data_cache[experiment_id]
 
 
 if __name__ == '__main__':
@@ -29,28 +29,37 @@ def make_ete_trees(agent_ids: Iterable[str]) -> List[TreeNode]:
     Returns:
         A list of the roots of the created trees.
     '''
-    stem = os.path.commonprefix(list(agent_ids))
+    agent_id_list = list(agent_ids)
+    # commonprefix only compares the smallest and largest IDs
+    stem = os.path.commonprefix(agent_id_list)
+    stem_len = len(stem)
+    # An agent's depth in the tree is the length of its phylogeny ID,
+    # so adding agents in order of depth adds every parent before its
+    # children without sorting all the IDs.
+    agents_by_depth: Dict[int, List[str]] = {}
+    for agent_id in agent_id_list:
+        agents_by_depth.setdefault(
+            len(agent_id) - stem_len, []).append(agent_id)
     id_node_map: Dict[str, TreeNode] = dict()
-    sorted_agents = sorted(agent_ids)
     roots: List[TreeNode] = []
-    for agent_id in sorted_agents:
-        phylogeny_id = agent_id[len(stem):]
-        try:
-            if phylogeny_id:
-                int(phylogeny_id)
-        except ValueError as e:
-            raise ValueError(
-                'String in ID {} after stem {} is non-numeric'.format(
-                    agent_id, stem)
-            ) from e
-        parent_phylo_id = phylogeny_id[:-1]
-        if parent_phylo_id in id_node_map:
-            parent = id_node_map[parent_phylo_id]
-            child = parent.add_child(name=agent_id)
-        else:
-            child = TreeNode(name=agent_id)
-            roots.append(child)
-        id_node_map[phylogeny_id] = child
+    for depth in sorted(agents_by_depth):
+        # Sort within each depth so siblings are in a stable order
+        for agent_id in sorted(agents_by_depth[depth]):
+            phylogeny_id = agent_id[stem_len:]
+            # isdecimal() accepts the same digits as int() without the
+            # cost of parsing the number.
+            if phylogeny_id and not phylogeny_id.isdecimal():
+                raise ValueError(
+                    'String in ID {} after stem {} is '
+                    'non-numeric'.format(agent_id, stem))
+            parent_phylo_id = phylogeny_id[:-1]
+            if parent_phylo_id in id_node_map:
+                parent = id_node_map[parent_phylo_id]
+                child = parent.add_child(name=agent_id)
+            else:
+                child = TreeNode(name=agent_id)
+                roots.append(child)
+            id_node_map[phylogeny_id] = child
     return roots
 
 
@@ -74,20 +83,25 @@ def plot_phylogeny(
             Range values specified as fractions of the final
             timepointpoint.
     '''
-    agent_ids: Set[str] = set()
-    dead_ids: Set[str] = set()
-    in_time_range_ids: Set[str] = set()
     end_time = max(data.keys())
-    for time, time_data in data.items():
-        agents_data = get_in(time_data, AGENTS_PATH)
-        assert agents_data is not None
-        agent_ids |= set(agents_data.keys())
-
-        if time_range[0] * end_time <= time <= time_range[1] * end_time:
-            in_time_range_ids |= set(agents_data.keys())
-            for agent_id, agent_data in agents_data.items():
-                if get_in(agent_data, PATH_TO_DEAD, False):
-                    dead_ids.add(agent_id)
+    start, stop = time_range[0] * end_time, time_range[1] * end_time
+    agents_by_time = {
+        time: get_in(time_data, AGENTS_PATH)
+        for time, time_data in data.items()
+    }
+    assert None not in agents_by_time.values()
+    agent_ids: Set[str] = set().union(*agents_by_time.values())
+    in_time_range = [
+        agents_data for time, agents_data in agents_by_time.items()
+        if start <= time <= stop
+    ]
+    in_time_range_ids: Set[str] = set().union(*in_time_range)
+    dead_ids = {
+        agent_id
+        for agents_data in in_time_range
+        for agent_id, agent_data in agents_data.items()
+        if get_in(agent_data, PATH_TO_DEAD, False)
+    }
 
     trees = make_ete_trees(agent_ids)
     assert len(trees) == 1
@@ -110,25 +124,26 @@ def plot_phylogeny(
         tstyle.legend.add_face(
             TextFace(' ' + label, ftype=FONT), column=1)
 
-    # Set styles for each node
-    for node in tree.traverse():
-        nstyle=NodeStyle()
+    # Set styles for each node. Nodes of the same color share a style.
+    styles: Dict[str, NodeStyle] = {}
+    for color in (dead_color, live_color, ignore_color):
+        nstyle = NodeStyle()
         nstyle['size'] = 5
         nstyle['vt_line_width'] = 1
         nstyle['hz_line_width'] = 1
+        nstyle['fgcolor'] = color
+        styles[color] = nstyle
+    for node in tree.traverse():
         if node.name in in_time_range_ids:
             if node.name in dead_ids:
-                nstyle['fgcolor'] = dead_color
+                node.set_style(styles[dead_color])
             else:
-                nstyle['fgcolor'] = live_color
+                node.set_style(styles[live_color])
         else:
-            nstyle['fgcolor'] = ignore_color
-        node.set_style(nstyle)
+            node.set_style(styles[ignore_color])
     tree.render(out, tree_style=tstyle, w=400)
-    survive_col = []
-    agents_col = []
-    for agent in in_time_range_ids:
-        agents_col.append(agent)
-        survive_col.append(0 if agent in dead_ids else 1)
+    # Sort the agents so the table is the same from run to run
+    agents_col = pd.Series(sorted(in_time_range_ids), dtype=object)
+    survive_col = (~agents_col.isin(dead_ids)).astype(int)
     df = pd.DataFrame({'agents': agents_col, 'survival': survive_col})
     return tree, df
@@ -10,15 +10,16 @@ Copyright (c) 2018-2021 The Vivarium Authors, 2021 Christopher Skalnik
 
 from __future__ import absolute_import, division, print_function
 
+import io
 import os
 import math
 import random
-import itertools
 
 import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import matplotlib.lines as mlines
+from matplotlib.collections import LineCollection, PolyCollection
 from matplotlib.lines import Line2D
 from matplotlib.colors import hsv_to_rgb
 from mpl_toolkits.axes_grid1 import (
@@ -41,11 +42,42 @@ BASELINE_TAG_COLOR = [0, 0, 1]  # HSV
 FLOURESCENT_SV = [0.75, 1.0]  # SV for fluorescent colors
 
 def check_plt_backend():
-    # reset matplotlib backend for non-interactive plotting
-    plt.close('all')
+    # reset matplotlib backend for non-interactive plotting. Figures
+    # are left open, since callers may still be using them; each plot
+    # function closes its own figure when it is done.
     if plt.get_backend() == 'TkAgg':
         matplotlib.use('Agg')
 
+def save_cropped(fig, fig_path):
+    '''Save a figure cropped to its contents.
+
+    This gives the same crop as ``bbox_inches='tight'``, but
+    ``savefig`` finds that crop by drawing the whole figure before
+    drawing it again to save it. These figures are large, so the extra
+    draw is expensive. Here the crop is computed from the extents of the
+    figure's artists instead, without drawing them.
+    '''
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer())
+    fig.savefig(
+        fig_path,
+        bbox_inches=bbox.padded(plt.rcParams['savefig.pad_inches']))
+
+def render_cropped(fig):
+    '''Render a figure to an RGB array, cropped like ``save_cropped``.
+
+    The pixels are the same as those of a PNG from ``save_cropped``, but
+    no image file is encoded. Returns an array of shape ``(height,
+    width, 3)`` and dtype ``uint8``.
+    '''
+    bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(
+        plt.rcParams['savefig.pad_inches'])
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='rgba', dpi=fig.dpi, bbox_inches=bbox)
+    # Agg truncates the cropped canvas size to whole pixels
+    width = int(bbox.width * fig.dpi)
+    rgba = np.frombuffer(buffer.getbuffer(), dtype=np.uint8)
+    return rgba.reshape(-1, width, 4)[..., :3]
+
 class LineWidthData(Line2D):
     def __init__(self, *args, **kwargs):
         _lw_data = kwargs.pop('linewidth', 1)
@@ -65,7 +97,24 @@ class LineWidthData(Line2D):
 
     _linewidth = property(_get_lw, _set_lw)
 
-def plot_agent(ax, data, color, agent_shape, alpha=1):
+class LineWidthDataCollection(LineCollection):
+    '''A LineCollection whose line widths are in data units.
+
+    Like :py:class:`LineWidthData`, the widths in points are recomputed
+    from the axes' data transform whenever the collection is drawn.
+    '''
+    def __init__(self, segments, linewidths_data, **kwargs):
+        super().__init__(segments, **kwargs)
+        self._lw_data = np.asarray(linewidths_data, dtype=float)
+
+    def draw(self, renderer):
+        ppd = 72./self.axes.figure.dpi
+        trans = self.axes.transData.transform
+        scale = (trans((0, 1)) - trans((0, 0)))[1] * ppd
+        self.set_linewidth(self._lw_data * scale)
+        super().draw(renderer)
+
+def plot_agent(ax, data, color, agent_shape, alpha=1, rasterized=False):
     x_center = data['boundary']['location'][0]
     y_center = data['boundary']['location'][1]
 
@@ -98,6 +147,7 @@ def plot_agent(ax, data, color, agent_shape, alpha=1):
             edgecolor='w',
             alpha=alpha,
             facecolor=rgb,
+            rasterized=rasterized,
         )
         ax.add_patch(shape)
 
@@ -127,13 +177,15 @@ def plot_agent(ax, data, color, agent_shape, alpha=1):
             color=membrane_color,
             linewidth=width,
             alpha=alpha,
-            solid_capstyle='round')
+            solid_capstyle='round',
+            rasterized=rasterized)
         line = LineWidthData(
             [x1, x2], [y1, y2],
             color=rgb,
             alpha=alpha,
             linewidth=width-membrane_width,
-            solid_capstyle='round')
+            solid_capstyle='round',
+            rasterized=rasterized)
         ax.add_line(membrane)
         ax.add_line(line)
 
@@ -147,12 +199,110 @@ def plot_agent(ax, data, color, agent_shape, alpha=1):
 
         # Create a circle
         circle = patches.Circle(
-            (x, y), radius, linewidth=1, edgecolor='b', alpha=alpha)
+            (x, y), radius, linewidth=1, edgecolor='b', alpha=alpha,
+            rasterized=rasterized)
         ax.add_patch(circle)
 
+def colors_to_rgb(colors):
+    '''Convert a list of agent colors to an (N, 3) RGB array.
+
+    Colors that are strings are already RGB. The rest are HSV and are
+    converted together in a single hsv_to_rgb call. Strings are usually
+    one fill color shared by many agents, so each distinct string is
+    converted only once.
+    '''
+    rgbs = np.empty((len(colors), 3))
+    hsv_indices = []
+    indices_by_string = {}
+    for i, color in enumerate(colors):
+        if isinstance(color, str):
+            indices_by_string.setdefault(color, []).append(i)
+        else:
+            hsv_indices.append(i)
+    if hsv_indices:
+        rgbs[hsv_indices] = hsv_to_rgb(np.array(
+            [colors[i] for i in hsv_indices], dtype=float))
+    for color, indices in indices_by_string.items():
+        rgbs[indices] = matplotlib.colors.to_rgb(color)
+    return rgbs
+
+def plot_segments(
+    ax, centers, thetas, lengths, widths, rgbs, alpha=1, rasterized=False
+):
+    '''Plot agents as segments with rounded ends and a membrane.
+
+    This draws the same agents as the ``'segment'`` shape of
+    :py:func:`plot_agent`, but as a single collection. Each agent's
+    membrane is drawn directly beneath its fill, so overlapping agents
+    stack in the same order as before.
+
+    - centers: (N, 2) array of agent locations
+    - thetas: (N,) array of agent angles in radians
+    - lengths, widths: (N,) arrays of agent dimensions
+    - rgbs: (N, 3) array of agent RGB colors
+    '''
+    membrane_width = 0.1
+    membrane_color = [0, 0, 0]
+    radius = widths / 2
+
+    # get the two ends
+    length_offsets = (lengths / 2) - radius
+    offsets = np.stack([
+        - length_offsets * np.sin(thetas),
+        length_offsets * np.cos(thetas),
+    ], axis=1)
+    segments = np.stack([centers - offsets, centers + offsets], axis=1)
+
+    # interleave each agent's membrane and fill
+    lines = np.repeat(segments, 2, axis=0)
+    linewidths = np.stack([widths, widths - membrane_width], axis=1).ravel()
+    colors = np.empty((2 * len(rgbs), 3))
+    colors[0::2] = membrane_color
+    colors[1::2] = rgbs
+    collection = LineWidthDataCollection(
+        lines, linewidths,
+        colors=colors,
+        alpha=alpha,
+        capstyle='round',
+        rasterized=rasterized)
+    ax.add_collection(collection)
+
+def plot_rectangles(
+    ax, centers, thetas, lengths, widths, rgbs, alpha=1, rasterized=False
+):
+    '''Plot agents as rectangles.
+
+    This draws the same agents as the ``'rectangle'`` shape of
+    :py:func:`plot_agent`, but as a single collection. The arguments are
+    as for :py:func:`plot_segments`.
+    '''
+    # corners of each rectangle relative to its center, before rotation
+    half_widths = widths / 2
+    half_lengths = lengths / 2
+    corners = np.stack([
+        np.stack([-half_widths, -half_lengths], axis=1),
+        np.stack([half_widths, -half_lengths], axis=1),
+        np.stack([half_widths, half_lengths], axis=1),
+        np.stack([-half_widths, half_lengths], axis=1),
+    ], axis=1)
+    cos = np.cos(thetas)[:, np.newaxis]
+    sin = np.sin(thetas)[:, np.newaxis]
+    verts = np.stack([
+        corners[..., 0] * cos - corners[..., 1] * sin,
+        corners[..., 0] * sin + corners[..., 1] * cos,
+    ], axis=2) + centers[:, np.newaxis, :]
+    collection = PolyCollection(
+        verts,
+        linewidths=2,
+        edgecolors='w',
+        alpha=alpha,
+        facecolors=rgbs,
+        rasterized=rasterized)
+    ax.add_collection(collection)
+
 def plot_agents(
-    ax, agents, agent_colors={}, agent_shape='segment', dead_color=None,
-    alpha=1
+    ax, agents, agent_colors=None, agent_shape='segment', dead_color=None,
+    alpha=1, rasterized=False, agent_rgbs=None
 ):
     '''
     - ax: the axis for plot
@@ -162,43 +312,100 @@ def plot_agents(
     - dead_color: List of 3 floats that define HSV color to use for dead
       cells. Dead cells only get treated differently if this is set.
     - alpha: Alpha value for agents.
+    - rasterized: Whether to rasterize the agents in vector output.
+    - agent_rgbs: (N, 3) array of RGB colors, one row per agent in the
+      order of agents. If set, agent_colors and dead_color are ignored.
     '''
-    for agent_id, agent_data in agents.items():
-        color = agent_colors.get(agent_id, [DEFAULT_HUE]+DEFAULT_SV)
-        if dead_color and 'boundary' in agent_data and 'dead' in agent_data['boundary']:
-            if agent_data['boundary']['dead']:
-                color = dead_color
-        plot_agent(ax, agent_data, color, agent_shape, alpha)
+    if agent_rgbs is None:
+        agent_colors = agent_colors or {}
+        colors = []
+        for agent_id, agent_data in agents.items():
+            color = agent_colors.get(agent_id, [DEFAULT_HUE]+DEFAULT_SV)
+            if dead_color and 'boundary' in agent_data and 'dead' in agent_data['boundary']:
+                if agent_data['boundary']['dead']:
+                    color = dead_color
+            colors.append(color)
+    if agents and agent_shape in ('segment', 'rectangle'):
+        # Draw all the agents as one collection instead of adding an
+        # artist per agent, which is slow for large colonies.
+        boundaries = [agent_data['boundary'] for agent_data in agents.values()]
+        centers = np.array(
+            [boundary['location'][:2] for boundary in boundaries],
+            dtype=float)
+        # rotate 90 degrees to match field
+        thetas = np.radians(np.array(
+            [boundary['angle'] for boundary in boundaries],
+            dtype=float) / PI * 180 + 90)
+        lengths = np.array(
+            [boundary['length'] for boundary in boundaries], dtype=float)
+        widths = np.array(
+            [boundary['width'] for boundary in boundaries], dtype=float)
+        if agent_rgbs is None:
+            rgbs = colors_to_rgb(colors)
+        else:
+            rgbs = np.asarray(agent_rgbs, dtype=float)
+        if agent_shape == 'segment':
+            plot_segments(
+                ax, centers, thetas, lengths, widths, rgbs, alpha,
+                rasterized)
+        else:
+            plot_rectangles(
+                ax, centers, thetas, lengths, widths, rgbs, alpha,
+                rasterized)
+    else:
+        if agent_rgbs is not None:
+            # plot_agent treats strings as RGB colors
+            colors = [
+                matplotlib.colors.to_hex(rgb) for rgb in agent_rgbs]
+        for agent_data, color in zip(agents.values(), colors):
+            plot_agent(ax, agent_data, color, agent_shape, alpha, rasterized)
     if len(agents) == 1:
         ax.set_title('1 agent', y=1.1)
     else:
         ax.set_title(f'{len(agents)} agents', y=1.1)
 
-def mutate_color(baseline_hsv):
+def mutate_colors(baseline_hsvs):
+    '''Mutate an (N, 3) array of HSV colors, one color per row'''
     mutation = 0.1
-    new_hsv = [
-        (n + np.random.uniform(-mutation, mutation))
-        for n in baseline_hsv]
+    # draw all the mutations at once
+    new_hsvs = np.asarray(baseline_hsvs, dtype=float)
+    new_hsvs = new_hsvs + np.random.uniform(
+        -mutation, mutation, new_hsvs.shape)
     # wrap hue around
-    new_hsv[0] = new_hsv[0] % 1
+    new_hsvs[:, 0] %= 1
     # reflect saturation and value
-    if new_hsv[1] > 1:
-        new_hsv[1] = 2 - new_hsv[1]
-    if new_hsv[2] > 1:
-        new_hsv[2] = 2 - new_hsv[2]
-    return new_hsv
+    new_hsvs[:, 1:] = np.where(
+        new_hsvs[:, 1:] > 1, 2 - new_hsvs[:, 1:], new_hsvs[:, 1:])
+    return new_hsvs
 
-def color_phylogeny(ancestor_id, phylogeny, baseline_hsv, phylogeny_colors={}):
+def color_phylogeny(ancestor_id, phylogeny, baseline_hsv, phylogeny_colors=None):
     """
-    get colors for all descendants of the ancestor
-    through recursive calls to each generation
+    get colors for all descendants of the ancestor, mutating each
+    daughter's color from its mother's
+
+    Lineages are walked one generation at a time rather than
+    recursively, so deep lineages cannot hit the recursion limit, and
+    the colors of a whole generation are mutated together.
     """
-    phylogeny_colors.update({ancestor_id: baseline_hsv})
-    daughter_ids = phylogeny.get(ancestor_id)
-    if daughter_ids:
-        for daughter_id in daughter_ids:
-            daughter_color = mutate_color(baseline_hsv)
-            color_phylogeny(daughter_id, phylogeny, daughter_color)
+    if phylogeny_colors is None:
+        phylogeny_colors = {}
+    phylogeny_colors[ancestor_id] = baseline_hsv
+    generation = [ancestor_id]
+    generation_colors = np.array([baseline_hsv], dtype=float)
+    while True:
+        daughter_ids = []
+        mother_indices = []
+        for i, mother_id in enumerate(generation):
+            for daughter_id in phylogeny.get(mother_id) or []:
+                daughter_ids.append(daughter_id)
+                mother_indices.append(i)
+        if not daughter_ids:
+            break
+        generation = daughter_ids
+        generation_colors = mutate_colors(
+            generation_colors[mother_indices])
+        phylogeny_colors.update(
+            zip(daughter_ids, generation_colors.tolist()))
     return phylogeny_colors
 
 def get_phylogeny_colors_from_names(agent_ids, initial_hues=None):
@@ -208,18 +415,19 @@ def get_phylogeny_colors_from_names(agent_ids, initial_hues=None):
     initial_hues = initial_hues or {}
 
     # make phylogeny with {mother_id: [daughter_1_id, daughter_2_id]}
+    # by looking up each agent's mother instead of comparing every pair
+    # of agents. Daughters stay in the order of agent_ids.
     phylogeny = {agent_id: [] for agent_id in agent_ids}
-    for agent1, agent2 in itertools.combinations(agent_ids, 2):
-        if agent1 == agent2[0:-1]:
-            phylogeny[agent1].append(agent2)
-        elif agent2 == agent1[0:-1]:
-            phylogeny[agent2].append(agent1)
-
-    # get initial ancestors
-    daughters = list(phylogeny.values())
-    daughters = set([item for sublist in daughters for item in sublist])
-    mothers = set(list(phylogeny.keys()))
-    ancestors = list(mothers - daughters)
+    for agent_id in agent_ids:
+        mother_id = agent_id[0:-1]
+        if agent_id and mother_id in phylogeny:
+            phylogeny[mother_id].append(agent_id)
+
+    # get initial ancestors, which are the agents without mothers
+    ancestors = [
+        agent_id for agent_id in phylogeny
+        if not (agent_id and agent_id[0:-1] in phylogeny)
+    ]
 
     # agent colors based on phylogeny
     agent_colors = {agent_id: [] for agent_id in agent_ids}
@@ -231,6 +439,34 @@ def get_phylogeny_colors_from_names(agent_ids, initial_hues=None):
     return agent_colors
 
 
+def plot_field_grid(ax, shape, edge_length_x, edge_length_y, color):
+    '''Draw gridlines between the bins of a field.
+
+    This looks the same as placing a tick at each bin edge and calling
+    ``ax.grid``, but draws the lines as two collections instead of
+    creating a pair of Tick objects per gridline.
+
+    - shape: shape of the (transposed) field, as (rows, columns)
+    '''
+    line_kwargs = {
+        'colors': color,
+        'linestyles': '-',
+        'linewidths': 1,
+        # gridlines are drawn with the axis, beneath lines and patches
+        'zorder': 1.5,
+    }
+    # Like gridlines, span the axes in the other direction
+    xs = np.linspace(0, edge_length_x, shape[1] + 1)
+    ax.add_collection(LineCollection(
+        [((x, 0), (x, 1)) for x in xs],
+        transform=ax.get_xaxis_transform(), **line_kwargs),
+        autolim=False)
+    ys = np.linspace(0, edge_length_y, shape[0] + 1)
+    ax.add_collection(LineCollection(
+        [((0, y), (1, y)) for y in ys],
+        transform=ax.get_yaxis_transform(), **line_kwargs),
+        autolim=False)
+
 def plot_snapshots(data, plot_config):
     '''Plot snapshots of the simulation over time
 
@@ -302,6 +538,17 @@ def plot_snapshots(data, plot_config):
             * **grid_color** (any valid matplotlib color): Whether to
               show. Defaults to an empty string, in which case no
               gridlines are shown.
+            * **rasterize_agents** (:py:class:`bool`): Whether to
+              rasterize the agents at the figure DPI when saving to a
+              vector format. This shrinks files with many agents.
+              Defaults to False.
+            * **collect_stats** (:py:class:`bool`): Whether to compute
+              the field quartiles returned under ``fields``. Defaults to
+              True.
+            * **return_image** (:py:class:`bool`): Whether to return
+              the figure as an RGB array from ``render_cropped`` instead
+              of saving it under ``out_dir``. The stats are not returned
+              in that case. Defaults to False.
     '''
     check_plt_backend()
 
@@ -328,6 +575,9 @@ def plot_snapshots(data, plot_config):
     agent_colors = plot_config.get('agent_colors', {})
     field_range = plot_config.get('field_range', {})
     begin_gradient = plot_config.get('begin_gradient', 0.25)
+    rasterize_agents = plot_config.get('rasterize_agents', False)
+    collect_stats = plot_config.get('collect_stats', True)
+    return_image = plot_config.get('return_image', False)
 
     # get data
     agents = data.get('agents', {})
@@ -358,6 +608,9 @@ def plot_snapshots(data, plot_config):
 
     # get fields id and range
     field_ids = []
+    # {field_id: array of the field at every time}, kept so snapshots
+    # can reuse the arrays the range was computed from
+    field_stacks = {}
     if fields:
         if include_fields is None:
             field_ids = set(fields[time_vec[0]].keys())
@@ -366,9 +619,13 @@ def plot_snapshots(data, plot_config):
         field_ids -= set(skip_fields)
         for field_id in field_ids:
             if field_id not in field_range:
-                field_min = min([min(min(field_data[field_id])) for t, field_data in fields.items()])
-                field_max = max([max(max(field_data[field_id])) for t, field_data in fields.items()])
-                field_range[field_id] = [field_min, field_max]
+                stack = np.array([
+                    field_data[field_id] for field_data in fields.values()
+                ])
+                field_stacks[field_id] = stack
+                field_range[field_id] = [
+                    float(stack.min()), float(stack.max())]
+        field_time_indices = {time: i for i, time in enumerate(fields)}
 
     # get agent ids
     agent_ids = set()
@@ -437,35 +694,24 @@ def plot_snapshots(data, plot_config):
     super_ax.spines['bottom'].set_linewidth(2)
 
     # Make the colormap
-    min_rgb = matplotlib.colors.to_rgb(min_color)
-    max_rgb = matplotlib.colors.to_rgb(max_color)
-    colors_dict = {
-        'red': [
-            [0, min_rgb[0], min_rgb[0]],
-            [begin_gradient, max_rgb[0], max_rgb[0]],
-            [1, max_rgb[0], max_rgb[0]],
-        ],
-        'green': [
-            [0, min_rgb[1], min_rgb[1]],
-            [begin_gradient, max_rgb[1], max_rgb[1]],
-            [1, max_rgb[1], max_rgb[1]],
-        ],
-        'blue': [
-            [0, min_rgb[2], min_rgb[2]],
-            [begin_gradient, max_rgb[2], max_rgb[2]],
-            [1, max_rgb[2], max_rgb[2]],
-        ],
-    }
-    cmap = matplotlib.colors.LinearSegmentedColormap(
-        'field', segmentdata=colors_dict, N=512)
+    cmap = matplotlib.colors.LinearSegmentedColormap.from_list(
+        'field',
+        [(0, min_color), (begin_gradient, max_color), (1, max_color)],
+        N=512)
 
     stats = {
         'agents': {},
     }
-    if field_ids:
+    if field_ids and collect_stats:
         stats['fields'] = {
             field_id: {} for field_id in field_ids
         }
+    # one normalization per field, shared by all its snapshots and its
+    # colorbar
+    field_norms = {
+        field_id: matplotlib.colors.Normalize(*field_range[field_id])
+        for field_id in field_ids
+    }
     # plot snapshot data in each subsequent column
     for col_idx, (time_idx, time) in enumerate(zip(time_indices, snapshot_times)):
         stats['agents'][time] = len(agents[time])
@@ -476,39 +722,32 @@ def plot_snapshots(data, plot_config):
                     fig, edge_length_x, edge_length_y, grid, row_idx,
                     col_idx, time, field_id, field_label_size,
                 )
-                ax.tick_params(
-                    axis='both', which='both', bottom=False, top=False,
-                    left=False, right=False,
-                )
 
                 # transpose field to align with agents
-                field = np.transpose(np.array(fields[time][field_id]))
+                if field_id in field_stacks:
+                    field = field_stacks[field_id][
+                        field_time_indices[time]].T
+                else:
+                    field = np.asarray(fields[time][field_id]).T
                 vmin, vmax = field_range[field_id]
-                q1, q2, q3 = np.percentile(field, [25, 50, 75])
-                stats['fields'][field_id][time] = (
-                    field.min(), q1, q2, q3, field.max())
-                im = plt.imshow(field.tolist(),
-                                origin='lower',
-                                extent=[0, edge_length_x, 0, edge_length_y],
-                                vmin=vmin,
-                                vmax=vmax,
-                                cmap=cmap)
-                ax.set_yticks(
-                    np.linspace(0, edge_length_y, field.shape[0] + 1))
-                ax.set_xticks(
-                    np.linspace(0, edge_length_x, field.shape[1] + 1))
+                if collect_stats:
+                    q1, q2, q3 = np.percentile(field, [25, 50, 75])
+                    stats['fields'][field_id][time] = (
+                        field.min(), q1, q2, q3, field.max())
+                ax.imshow(field,
+                          origin='lower',
+                          extent=[0, edge_length_x, 0, edge_length_y],
+                          norm=field_norms[field_id],
+                          cmap=cmap)
                 if agents:
                     agents_now = agents[time]
                     plot_agents(
                         ax, agents_now, agent_colors, agent_shape,
-                        dead_color, agent_alpha)
+                        dead_color, agent_alpha, rasterize_agents)
                 if grid_color:
-                    ax.grid(
-                        which='both',
-                        color=grid_color,
-                        linestyle='-',
-                        linewidth=1,
-                    )
+                    plot_field_grid(
+                        ax, field.shape, edge_length_x, edge_length_y,
+                        grid_color)
 
                 if xlim:
                     ax.set_xlim(*xlim)
@@ -526,7 +765,10 @@ def plot_snapshots(data, plot_config):
                         continue
                     divider = make_axes_locatable(cbar_ax)
                     cax = divider.append_axes("left", size="5%", pad=0.0)
-                    fig.colorbar(im, cax=cax, format='%.3f')
+                    fig.colorbar(
+                        matplotlib.cm.ScalarMappable(
+                            norm=field_norms[field_id], cmap=cmap),
+                        cax=cax, format='%.3f')
                     cbar_ax.axis('off')
                 # Scale bar in first snapshot of each row
                 if col_idx == 0 and scale_bar_length:
@@ -545,16 +787,12 @@ def plot_snapshots(data, plot_config):
                 fig, bounds[0], bounds[1], grid, row_idx, col_idx,
                 time, ""
             )
-            ax.tick_params(
-                axis='both', which='both', bottom=False, top=False,
-                left=False, right=False,
-            )
 
             if agents:
                 agents_now = agents[time]
                 plot_agents(
                     ax, agents_now, agent_colors, agent_shape,
-                    dead_color, agent_alpha)
+                    dead_color, agent_alpha, rasterize_agents)
             if xlim:
                 ax.set_xlim(*xlim)
             if ylim:
@@ -571,30 +809,41 @@ def plot_snapshots(data, plot_config):
                 )
                 ax.add_artist(scale_bar)
 
-    fig_path = os.path.join(out_dir, filename)
     fig.subplots_adjust(wspace=0.7, hspace=0.1)
-    fig.savefig(fig_path, bbox_inches='tight')
+    if return_image:
+        image = render_cropped(fig)
+    else:
+        save_cropped(fig, os.path.join(out_dir, filename))
     plt.close(fig)
     plt.rcParams.update({'font.size': original_fontsize})
+    if return_image:
+        return image
     return stats
 
 
 def get_tag_ranges(agents, tagged_molecules, convert_to_concs):
+    # collect every level of each tag, then reduce each tag with numpy
+    levels = {tag_id: [] for tag_id in tagged_molecules}
+    volumes = []
+    for time_data in agents.values():
+        for agent_data in time_data.values():
+            volumes.append(
+                agent_data.get('boundary', {}).get('volume', 0))
+            for tag_id, tag_levels in levels.items():
+                tag_levels.append(get_value_from_path(agent_data, tag_id))
+    if not volumes:
+        return {}
+    volumes = np.array(volumes, dtype=float)
     tag_ranges = {}
-    for time, time_data in agents.items():
-        for agent_id, agent_data in time_data.items():
-            volume = agent_data.get('boundary', {}).get('volume', 0)
-            for tag_id in tagged_molecules:
-                level = get_value_from_path(agent_data, tag_id)
-                if convert_to_concs:
-                    level = level / volume if volume else 0
-                if tag_id in tag_ranges:
-                    tag_ranges[tag_id] = [
-                        min(tag_ranges[tag_id][0], level),
-                        max(tag_ranges[tag_id][1], level)]
-                else:
-                    # add new tag
-                    tag_ranges[tag_id] = [level, level]
+    for tag_id, tag_levels in levels.items():
+        tag_levels = np.array(tag_levels, dtype=float)
+        if convert_to_concs:
+            # agents without volume have a concentration of 0
+            tag_levels = np.divide(
+                tag_levels, volumes, out=np.zeros_like(tag_levels),
+                where=volumes != 0)
+        tag_ranges[tag_id] = [
+            float(tag_levels.min()), float(tag_levels.max())]
     return tag_ranges
 
 
@@ -650,6 +899,13 @@ def plot_tags(data, plot_config):
               of lower and upper x-axis limits.
             * **ylim** (:py:class:`tuple` of :py:class:`float`): Tuple
               of lower and upper y-axis limits.
+            * **rasterize_agents** (:py:class:`bool`): Whether to
+              rasterize the agents at the figure DPI when saving to a
+              vector format. This shrinks files with many agents.
+              Defaults to False.
+            * **return_image** (:py:class:`bool`): Whether to return
+              the figure as an RGB array from ``render_cropped`` instead
+              of saving it under ``out_dir``. Defaults to False.
     '''
     check_plt_backend()
 
@@ -670,6 +926,8 @@ def plot_tags(data, plot_config):
     ylim = plot_config.get('ylim')
     tag_ranges = plot_config.get('tag_ranges', {})
     snapshot_times = plot_config.get('snapshot_times', [])
+    rasterize_agents = plot_config.get('rasterize_agents', False)
+    return_image = plot_config.get('return_image', False)
 
     if tagged_molecules == []:
         raise ValueError('At least one molecule must be tagged.')
@@ -741,25 +999,8 @@ def plot_tags(data, plot_config):
     for row_idx, tag_id in enumerate(tag_ranges.keys()):
         tag_name = tag_path_name_map.get(tag_id, tag_id)
         min_tag, max_tag = tag_ranges[tag_id]
-        min_color, max_color = tag_colors[tag_id]
-        min_rgb = matplotlib.colors.to_rgb(min_color)
-        max_rgb = matplotlib.colors.to_rgb(max_color)
-        colors_dict = {
-            'red': [
-                [0, min_rgb[0], min_rgb[0]],
-                [1, max_rgb[0], max_rgb[0]],
-            ],
-            'green': [
-                [0, min_rgb[1], min_rgb[1]],
-                [1, max_rgb[1], max_rgb[1]],
-            ],
-            'blue': [
-                [0, min_rgb[2], min_rgb[2]],
-                [1, max_rgb[2], max_rgb[2]],
-            ],
-        }
-        cmap = matplotlib.colors.LinearSegmentedColormap(
-            tag_id, segmentdata=colors_dict, N=512)
+        cmap = matplotlib.colors.LinearSegmentedColormap.from_list(
+            tag_id, tag_colors[tag_id], N=512)
 
         norm = matplotlib.colors.Normalize(min_tag, max_tag)
 
@@ -770,27 +1011,27 @@ def plot_tags(data, plot_config):
                 fig, edge_length_x, edge_length_y, grid,
                 row_idx, col_idx, time, tag_name, tag_label_size,
             )
-            ax.tick_params(
-                axis='both', which='both', bottom=False, top=False,
-                left=False, right=False,
-            )
             ax.set_facecolor(background_color)
 
-            agent_tag_colors = {}
-            for agent_id, agent_data in agents[time].items():
-                # get current tag concentration, and determine color
-                level = get_value_from_path(agent_data, tag_id)
-                if convert_to_concs:
-                    volume = get_in(
-                        agent_data, ('boundary', 'volume'), 0)
-                    level = level / volume if volume else 0
-                intensity = norm(level)
-                agent_rgb = cmap(intensity)[:3]
-                agent_hsv = matplotlib.colors.rgb_to_hsv(
-                    agent_rgb)
-                agent_tag_colors[agent_id] = agent_hsv
-
-            plot_agents(ax, agents[time], agent_tag_colors, agent_shape)
+            # get current tag concentrations, and determine colors with
+            # one colormap lookup for all the agents
+            levels = np.array([
+                get_value_from_path(agent_data, tag_id)
+                for agent_data in agents[time].values()
+            ], dtype=float)
+            if convert_to_concs:
+                volumes = np.array([
+                    get_in(agent_data, ('boundary', 'volume'), 0)
+                    for agent_data in agents[time].values()
+                ], dtype=float)
+                levels = np.divide(
+                    levels, volumes, out=np.zeros_like(levels),
+                    where=volumes != 0)
+            agent_rgbs = cmap(norm(levels))[:, :3]
+
+            plot_agents(
+                ax, agents[time], agent_shape=agent_shape,
+                rasterized=rasterize_agents, agent_rgbs=agent_rgbs)
 
             if xlim:
                 ax.set_xlim(*xlim)
@@ -824,11 +1065,15 @@ def plot_tags(data, plot_config):
                 )
                 ax.add_artist(scale_bar)
 
-    fig_path = os.path.join(out_dir, filename)
     fig.subplots_adjust(wspace=0.7, hspace=0.1)
-    fig.savefig(fig_path, bbox_inches='tight')
+    if return_image:
+        image = render_cropped(fig)
+    else:
+        save_cropped(fig, os.path.join(out_dir, filename))
     plt.close(fig)
     plt.rcParams.update({'font.size': original_fontsize})
+    if return_image:
+        return image
 
 
 
@@ -847,6 +1092,8 @@ def init_axes(
             horizontalalignment='right', labelpad=50,
         )
     ax.set(xlim=[0, edge_length_x], ylim=[0, edge_length_y], aspect=1)
-    ax.set_yticklabels([])
-    ax.set_xticklabels([])
+    # Remove the ticks instead of blanking their labels so that no
+    # Tick objects get created for the default locations
+    ax.set_xticks([])
+    ax.set_yticks([])
     return ax
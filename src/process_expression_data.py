@@ -6,6 +6,8 @@ import json
 import os
 
 from typing import Dict
+import ijson
+import numpy as np
 import pandas as pd
 from vivarium.library.topology import get_in
 
@@ -33,20 +35,68 @@ def raw_data_to_end_expression_table(
         agent in the final simulation timepoint.
     '''
     end_data = raw_data[max(raw_data.keys())]
-    expression_data: Dict = {
+    counts: Dict[str, list] = {
         name: []
         for name in paths_dict
     }
-    expression_data[VOLUME_KEY] = []
+    # Protein paths usually share a parent store, like the counts, so
+    # resolve each parent once per agent and then look up the leaves.
+    leaves = [
+        (counts[name], path[:-1], path[-1])
+        for name, path in paths_dict.items()
+    ]
+    parent_paths = {parent_path for _, parent_path, _ in leaves}
+    volumes = []
     agents_data = get_in(end_data, AGENTS_PATH)
     for agent_data in agents_data.values():
-        volume = get_in(agent_data, VOLUME_PATH, 0)
-        expression_data[VOLUME_KEY].append(volume)
-        for name, path in paths_dict.items():
-            count = get_in(agent_data, path, 0)
-            concentration = count / volume if volume else 0
-            expression_data[name].append(concentration)
-    return pd.DataFrame(expression_data)
+        volumes.append(get_in(agent_data, VOLUME_PATH, 0))
+        parents = {
+            parent_path: get_in(agent_data, parent_path, {})
+            for parent_path in parent_paths
+        }
+        for name_counts, parent_path, key in leaves:
+            name_counts.append(parents[parent_path].get(key, 0))
+    # One row per agent and one column per protein
+    counts_array = np.array(list(counts.values()), dtype=float).reshape(
+        len(counts), len(volumes)).T
+    volumes_array = np.array(volumes, dtype=float)[:, np.newaxis]
+    # Divide all the columns at once. Agents with no volume get a
+    # concentration of 0.
+    concentrations = np.divide(
+        counts_array, volumes_array, out=np.zeros_like(counts_array),
+        where=volumes_array != 0)
+    table = pd.DataFrame(concentrations, columns=list(counts))
+    table[VOLUME_KEY] = volumes
+    return table
+
+
+def load_end_timepoint(json_path: str) -> RawData:
+    '''Load the final timepoint of raw simulation data from JSON.
+
+    The file is streamed with ijson one timepoint at a time, keeping
+    only the latest, so the whole simulation is never held in memory.
+    ijson rejects the Infinity tokens that json writes for infinite
+    values, so files with them are loaded whole with json instead.
+
+    Args:
+        json_path: Path to a JSON file that maps times to timepoints.
+
+    Returns:
+        Raw data with only the final timepoint.
+    '''
+    end_time = ''
+    end_data = None
+    try:
+        with open(json_path, 'rb') as f:
+            for time, timepoint in ijson.kvitems(f, '', use_float=True):
+                if not end_time or float(time) > float(end_time):
+                    end_time, end_data = time, timepoint
+    except ijson.JSONError:
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        end_time = max(data, key=float)
+        end_data = data[end_time]
+    return RawData({float(end_time): end_data})
 
 
 def process_data(args: argparse.Namespace) -> None:
@@ -56,8 +106,7 @@ def process_data(args: argparse.Namespace) -> None:
         args: Command-line arguments from argparse.
     '''
     if args.json_file:
-        with open(args.json_path, 'r') as f:
-            data = json.load(f)
+        data = load_end_timepoint(args.json_file)
     else:
         data, _ = get_experiment_data(args, args.experiment_id)
     with open(args.tagged_molecules, 'r') as f:
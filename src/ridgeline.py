@@ -97,6 +97,23 @@ def get_ridgeline_plot(
     return fig
 
 
+def _calculate_density_curve(
+        data_values: np.ndarray,
+        x_values: Union[Sequence[float], np.ndarray],
+        ) -> np.ndarray:
+    if len(data_values) > 1:
+        pdf = gaussian_kde(data_values)
+        return pdf(x_values)
+    density_curve = np.zeros(len(x_values))
+    if len(data_values) == 1:
+        # Put all the density at the first x value at or above the
+        # sample. x_values is sorted, so binary search finds it.
+        i = np.searchsorted(x_values, data_values[0], side='left')
+        if i < len(x_values):
+            density_curve[i] = 1
+    return density_curve
+
+
 def _calculate_density_curves(
         data: Sequence[Dict[str, Sequence[float]]],
         x_values: Union[Sequence[float], np.ndarray],
@@ -108,27 +125,26 @@ def _calculate_density_curves(
         ]:
     y_values: Dict[str, List[float]] = {}
     density_curves: Dict[str, List[np.ndarray]] = {}
-    offset = 0
+    # Density curves keyed by the bytes of the values they estimate, so
+    # that identical samples (e.g. repeated across replicates) are only
+    # estimated once. The curves are never modified in place.
+    curves_by_values: Dict[bytes, np.ndarray] = {}
+    offset = 0.
     for data_dict in data:
         y = 0.
         # Reverse order since we plot from bottom to top
-        for y_label in reversed(list(data_dict.keys())):
-            data_values = data_dict[y_label]
-            if len(data_values) > 1:
-                pdf = gaussian_kde(data_values)
-                density_curve = pdf(x_values)
-            elif len(data_values) == 1:
-                density_curve = np.zeros(len(x_values))
-                for i, x_value in enumerate(x_values):
-                    if x_value >= data_values[0]:
-                        density_curve[i] = 1
-                        break
-            else:
-                density_curve = np.zeros(len(x_values))
+        for y_label in reversed(data_dict):
+            data_values = np.asarray(data_dict[y_label], dtype=float)
+            key = data_values.tobytes()
+            if key not in curves_by_values:
+                curves_by_values[key] = _calculate_density_curve(
+                    data_values, x_values)
+            density_curve = curves_by_values[key]
             density_curves.setdefault(y_label, []).append(density_curve)
             y_values.setdefault(y_label, []).append(y)
-            y += max(density_curve) * (1 - overlap)
-            offset = max(offset, max(density_curve) * abs(overlap) / 2)
+            peak = float(density_curve.max())
+            y += peak * (1 - overlap)
+            offset = max(offset, peak * abs(overlap) / 2)
     max_y_values = {
         y_label: max(values)
         for y_label, values in y_values.items()
@@ -189,9 +205,18 @@ def plot_ridgeline(
         fontsize: The size to use for all text.
     '''
     if data_bounds is None:
-        flat_data = flatten([data_elem.values() for data_elem in data])
-        data_min = min(flat_data)
-        data_max = max(flat_data)
+        try:
+            # Fast path for the usual flat sequences of numbers
+            flat_data = np.concatenate([
+                np.asarray(values, dtype=float).ravel()
+                for data_elem in data
+                for values in data_elem.values()
+            ])
+        except ValueError:
+            flat_data = np.array(
+                flatten([data_elem.values() for data_elem in data]))
+        data_min = flat_data.min()
+        data_max = flat_data.max()
     else:
         data_min, data_max = data_bounds
     data_range = data_max - data_min
@@ -223,13 +248,13 @@ def plot_ridgeline(
                 color=cast(str, color), zorder=-1, alpha=fill_alpha)
             points = np.array(
                 data[j][y_label], dtype=float)  # type: ignore
-            # We disable pylint's no-member check because pylint doesn't
-            # recognize that np.random.random is valid.
-            # pylint: disable=no-member
-            points += (
-                np.random.random(len(points)) - 0.5  # type: ignore
-            ) * 2 * jitter
-            # pylint: enable=no-member
+            if jitter:
+                # We disable pylint's no-member check because pylint
+                # doesn't recognize that np.random.uniform is valid.
+                # pylint: disable=no-member
+                points += np.random.uniform(  # type: ignore
+                    -jitter, jitter, len(points))
+                # pylint: enable=no-member
             ax.scatter(points,  # type: ignore
                 np.ones(len(points)) * y - offset,
                 color=cast(str, color), marker='|', s=20,
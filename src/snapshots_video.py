@@ -1,8 +1,13 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import itertools
 import math
 import os
-import shutil
+import subprocess
+from typing import Callable, Deque, Iterable, Iterator, Sequence
 
-import cv2  # type: ignore
+from matplotlib import rcParams  # type: ignore
+import numpy as np
 
 from src.db import format_data_for_snapshots, format_data_for_tags
 from src.plot_snapshots import (
@@ -17,14 +22,18 @@ from src.types import RawData
 # 6.4 hours of simulation time in 10 seconds
 SPEED_SCALE = 10 / (6.4 * 60 * 60)
 FPS = 15  # Frames-per-second of final video
+# FFmpeg output options for each supported H.264 encoder
+ENCODER_OPTIONS = {
+    'libx264': ('-preset', 'fast', '-crf', '23'),
+    # Offloads encoding to an NVIDIA GPU
+    'h264_nvenc': ('-preset', 'p4', '-tune', 'hq'),
+}
 
 
 def plot_single_snapshot(
-        data, time, fields, out_dir, filename, agent_fill_color, xlim,
-        ylim, agent_alpha, agent_colors, field_range, scalebar_color):
+        data, time, fields, agent_fill_color, xlim, ylim, agent_alpha,
+        agent_colors, field_range, scalebar_color):
     plot_config = {
-        'out_dir': out_dir,
-        'filename': filename,
         'include_fields': fields,
         'field_label_size': 36,
         'default_font_size': 36,
@@ -43,18 +52,17 @@ def plot_single_snapshot(
         'agent_colors': agent_colors,
         'field_range': field_range,
         'begin_gradient': 1,
+        'collect_stats': False,
+        'return_image': True,
     }
-    plot_snapshots(data, plot_config)
+    return plot_snapshots(data, plot_config)
 
 
 def plot_single_tags_plot(
-        data, time, tags, tag_path_map, tag_ranges, out_dir, filename,
-        xlim, ylim):
+        data, time, tags, tag_path_map, tag_ranges, xlim, ylim):
     plot_config = {
-        'out_dir': out_dir,
         'tagged_molecules': tags,
         'background_color': 'white',
-        'filename': filename,
         'tag_path_name_map': tag_path_map,
         'tag_label_size': 36,
         'default_font_size': 36,
@@ -69,8 +77,109 @@ def plot_single_tags_plot(
         'ylim': ylim,
         'snapshot_times': [time],
         'tag_ranges': tag_ranges,
+        'return_image': True,
     }
-    plot_tags(data, plot_config)
+    return plot_tags(data, plot_config)
+
+
+def _init_worker(rc_params: dict) -> None:
+    # match the parent's style, e.g. fonts set by make_video.py
+    rcParams.update(rc_params)
+
+
+def plot_frames(
+        plot_function: Callable[..., np.ndarray],
+        frames_args: Sequence[tuple],
+        processes: int = 1) -> Iterator[np.ndarray]:
+    '''Plot each video frame by calling plot_function(*frame_args).
+
+    Yields the frame images in order. With more than one process,
+    frames are plotted in parallel worker processes. Each frame's
+    arguments are sent to its worker, so they should hold only the data
+    for that frame. At most two frames per process are in flight at
+    once, so finished frames do not pile up in memory while they wait
+    to be encoded.
+    '''
+    if processes <= 1:
+        for frame_args in frames_args:
+            yield plot_function(*frame_args)
+        return
+    rc_params = {
+        key: val for key, val in rcParams.items() if key != 'backend'}
+    with ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker,
+            initargs=(rc_params,)) as executor:
+        pending: Deque[Future] = deque()
+        for frame_args in frames_args:
+            pending.append(executor.submit(plot_function, *frame_args))
+            if len(pending) >= 2 * processes:
+                # raises any errors from the workers
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def get_available_codec(codec: str) -> str:
+    '''Fall back to libx264 if FFmpeg does not have ``codec``.
+
+    Args:
+        codec: Name of the preferred encoder from ``ENCODER_OPTIONS``.
+
+    Returns:
+        ``codec`` if FFmpeg lists it as an encoder, otherwise
+        ``libx264``.
+    '''
+    if codec == 'libx264':
+        return codec
+    encoders = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-encoders'],
+        capture_output=True, text=True, check=True).stdout
+    if codec in encoders.split():
+        return codec
+    print(f'FFmpeg has no {codec} encoder. Falling back to libx264.')
+    return 'libx264'
+
+
+def write_video(
+        frames: Iterable[np.ndarray],
+        out_file: str,
+        fps: float,
+        codec: str = 'libx264') -> None:
+    '''Encode RGB frames as an H.264 video by piping them to FFmpeg.
+
+    Args:
+        frames: Frames as ``uint8`` arrays of shape ``(height, width,
+            3)``. All frames must have the same shape.
+        out_file: Path to the video file to write.
+        fps: Frames per second of the video.
+        codec: Name of the encoder to use from ``ENCODER_OPTIONS``. If
+            FFmpeg does not have it, libx264 is used instead.
+    '''
+    codec = get_available_codec(codec)
+    frames_iter = iter(frames)
+    first_frame = next(frames_iter)
+    height, width, _ = first_frame.shape
+    command = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+        '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+        # yuv420p needs even dimensions, so pad odd ones with white
+        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2:color=white',
+        '-c:v', codec, *ENCODER_OPTIONS[codec],
+        '-pix_fmt', 'yuv420p', out_file,
+    ]
+    # Leaving the block closes FFmpeg's input and waits for it to finish
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as process:
+        assert process.stdin
+        for frame in itertools.chain([first_frame], frames_iter):
+            if frame.shape != first_frame.shape:
+                raise ValueError(
+                    f'Frame shape {frame.shape} does not match the '
+                    f'first frame shape {first_frame.shape}.')
+            process.stdin.write(frame.tobytes())
+    if process.returncode:
+        raise subprocess.CalledProcessError(
+            process.returncode, command)
 
 
 def make_tags_video(
@@ -82,11 +191,11 @@ def make_tags_video(
         filename='snapshot_vid',
         xlim=None,
         ylim=None,
+        processes=1,
+        codec='libx264',
         ):
-    # make images directory, remove if existing
+    os.makedirs(out_dir, exist_ok=True)
     out_file = os.path.join(out_dir, f'{filename}.mp4')
-    images_dir = os.path.join(out_dir, '_images')
-    os.makedirs(images_dir)
 
     all_times = list(data.keys())
     max_time = max(all_times)
@@ -101,34 +210,19 @@ def make_tags_video(
     tags_data = format_data_for_tags(data, environment_config)
     tag_ranges = get_tag_ranges(tags_data['agents'], tags, True)
 
-    # make the individual snapshot figures
-    img_paths = []
-    for i, time in enumerate(time_vec):
-        img_file = f'img_{i}.png'
-        plot_single_tags_plot(
-            tags_data, time, tags, tag_path_map, tag_ranges, images_dir,
-            img_file, xlim, ylim,
-        )
-        fig_path = os.path.join(images_dir, img_file)
-        img_paths.append(fig_path)
-
-    # make the video
-    img_array = []
-    for img_file in img_paths:
-        img = cv2.imread(img_file)
-        height, width, _ = img.shape
-        size = (width, height)
-        img_array.append(img)
-
-    out = cv2.VideoWriter(
-        out_file, cv2.VideoWriter_fourcc(*'mp4v'), true_fps, size)
-
-    for img_path in img_array:
-        out.write(img_path)
-    out.release()
-
-    # delete image folder
-    shutil.rmtree(images_dir)
+    # plot the frames and stream them into the video
+    frames_args = []
+    for time in time_vec:
+        frame_data = {
+            'agents': {time: tags_data['agents'][time]},
+            'config': tags_data['config'],
+        }
+        frames_args.append((
+            frame_data, time, tags, tag_path_map, tag_ranges, xlim,
+            ylim,
+        ))
+    frames = plot_frames(plot_single_tags_plot, frames_args, processes)
+    write_video(frames, out_file, true_fps, codec)
 
 
 def make_snapshots_video(
@@ -142,11 +236,11 @@ def make_snapshots_video(
         agent_alpha=1,
         agent_fill_color=None,
         field_added=0,
+        processes=1,
+        codec='libx264',
         ):
-    # make images directory, remove if existing
+    os.makedirs(out_dir, exist_ok=True)
     out_file = os.path.join(out_dir, f'{filename}.mp4')
-    images_dir = os.path.join(out_dir, '_images')
-    os.makedirs(images_dir)
 
     all_times = list(data.keys())
     max_time = max(all_times)
@@ -169,15 +263,11 @@ def make_snapshots_video(
     field_range = {}
     fields_data = snapshots_data['fields']
     for field in fields:
-        field_min = min([
-            min(min(field_data[field]))
-            for t, field_data in fields_data.items()
-        ])
-        field_max = max([
-            max(max(field_data[field]))
-            for t, field_data in fields_data.items()
+        # {time index, x, y}: the field at every timepoint
+        stack = np.array([
+            field_data[field] for field_data in fields_data.values()
         ])
-        field_range[field] = [field_min, field_max]
+        field_range[field] = [float(stack.min()), float(stack.max())]
     agent_colors = get_phylogeny_colors_from_names(agent_ids)
 
     if not fields:
@@ -186,34 +276,19 @@ def make_snapshots_video(
             for key, val in data.items() if key != 'fields'
         })
 
-    # make the individual snapshot figures
-    img_paths = []
-    for i, time in enumerate(time_vec):
+    # plot the frames and stream them into the video
+    frames_args = []
+    for time in time_vec:
         scalebar_color = (
             'black' if time < max_time * field_added else 'white')
-        img_file = f'img_{i}.png'
-        plot_single_snapshot(
-            snapshots_data, time, fields, images_dir, img_file,
-            agent_fill_color, xlim, ylim, agent_alpha, agent_colors,
-            field_range, scalebar_color,
-        )
-        fig_path = os.path.join(images_dir, img_file)
-        img_paths.append(fig_path)
-
-    # make the video
-    img_array = []
-    for img_file in img_paths:
-        img = cv2.imread(img_file)
-        height, width, _ = img.shape
-        size = (width, height)
-        img_array.append(img)
-
-    out = cv2.VideoWriter(
-        out_file, cv2.VideoWriter_fourcc(*'mp4v'), true_fps, size)
-
-    for img_path in img_array:
-        out.write(img_path)
-    out.release()
-
-    # delete image folder
-    shutil.rmtree(images_dir)
+        frame_data = {
+            'agents': {time: snapshots_data['agents'][time]},
+            'fields': {time: snapshots_data['fields'][time]},
+            'config': snapshots_data['config'],
+        }
+        frames_args.append((
+            frame_data, time, fields, agent_fill_color, xlim, ylim,
+            agent_alpha, agent_colors, field_range, scalebar_color,
+        ))
+    frames = plot_frames(plot_single_snapshot, frames_args, processes)
+    write_video(frames, out_file, true_fps, codec)
@@ -0,0 +1,48 @@
+import argparse
+import os
+import pickle
+
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+
+from src import db
+from src.db import get_experiment_data
+from src.types import EnvironmentConfig, RawData
+
+
+class TestGetExperimentData:
+
+    @staticmethod
+    def test_reads_cache(tmpdir: str) -> None:
+        cached = (
+            RawData({0.: {'agents': {}}}),
+            EnvironmentConfig({'bounds': [10, 10]}),
+        )
+        cache_path = os.path.join(tmpdir, 'localhost_1_db_exp.pickle')
+        with open(cache_path, 'wb') as f:
+            pickle.dump(cached, f)
+        # No MongoDB is reachable at this port, so the data can only
+        # come from the cache
+        args = argparse.Namespace(
+            data_path='', cache_dir=str(tmpdir), database_name='db',
+            host='localhost', port=1)
+        assert get_experiment_data(args, 'exp') == cached
+
+    @staticmethod
+    def test_failed_cache_write_cleaned_up(
+            tmpdir: str, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setattr(db, 'get_local_client', lambda *_: None)
+        monkeypatch.setattr(
+            db, 'data_from_database',
+            lambda *_: ({0.: {'dimensions': {}}}, None))
+
+        def _fail_dump(*_: object, **__: object) -> None:
+            raise pickle.PicklingError('unpicklable')
+
+        monkeypatch.setattr(db.pickle, 'dump', _fail_dump)
+        args = argparse.Namespace(
+            data_path='', cache_dir=str(tmpdir), database_name='db',
+            host='localhost', port=1)
+        with pytest.raises(pickle.PicklingError):
+            get_experiment_data(args, 'exp')
+        assert os.listdir(tmpdir) == []
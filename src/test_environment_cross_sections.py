@@ -0,0 +1,30 @@
+from typing import Dict, List
+
+import numpy as np
+
+from src.environment_cross_sections import (
+    get_enviro_sections_plot, SerializedField)
+
+
+class TestGetEnviroSectionsPlot:
+
+    @staticmethod
+    def test_stats_skip_infinite_replicates() -> None:
+        field = np.arange(4, dtype=float).reshape(2, 2)
+        fields_ts_list: List[
+            Dict[float, Dict[str, SerializedField]]] = [
+            {
+                0.: {'glc': (field * i).tolist()},
+                1.: {'glc': (field * i + 1).tolist()},
+            }
+            for i in range(1, 4)
+        ]
+        fields_ts_list[2][1]['glc'] = [[np.inf, 1], [7, 10]]
+        _, stats = get_enviro_sections_plot(
+            fields_ts_list, (2, 2), section_location=0.5)
+        q25, median, q75 = stats[0]
+        np.testing.assert_allclose(median, [4, 6])
+        np.testing.assert_allclose(q25, [3, 4.5])
+        np.testing.assert_allclose(q75, [5, 7.5])
+        _, median, _ = stats[1]
+        np.testing.assert_allclose(median, [4, 5.5])
@@ -0,0 +1,54 @@
+from typing import Dict
+
+from src.expression_survival import get_expression_survival_data
+from src.types import RawData
+
+
+def _make_agent_data(x: float, y: float, dead: bool) -> Dict:
+    return {
+        'x': x,
+        'y': y,
+        'boundary': {
+            'dead': dead,
+        },
+    }
+
+
+class TestGetExpressionSurvivalData:
+
+    data = RawData({
+        0: {
+            'agents': {
+                'agent': _make_agent_data(1, 2, False),
+            },
+        },
+        1: {
+            'agents': {
+                'agent0': _make_agent_data(3, 4, False),
+                'agent1': _make_agent_data(5, 6, False),
+            },
+        },
+        2: {
+            'agents': {
+                'agent0': _make_agent_data(7, 8, False),
+                'agent1': _make_agent_data(9, 10, True),
+            },
+        },
+    })
+
+    def test_finals(self) -> None:
+        survival_data = get_expression_survival_data(
+            self.data, ('x',), ('y',))
+        assert survival_data.live_finals_x == {'agent': 1, 'agent0': 7}
+        assert survival_data.live_finals_y == {'agent': 2, 'agent0': 8}
+        assert survival_data.dead_finals_x == {'agent1': 9}
+        assert survival_data.dead_finals_y == {'agent1': 10}
+        assert survival_data.final_live_agents == ['agent0']
+
+    def test_time_range(self) -> None:
+        survival_data = get_expression_survival_data(
+            self.data, ('x',), ('y',), (0.5, 1))
+        assert 'agent' not in survival_data.live_finals_x
+        timeseries = survival_data.path_timeseries[
+            ('agents', 'agent0', 'x')]
+        assert list(timeseries) == [3, 7]
@@ -0,0 +1,82 @@
+import os
+
+from src.fingerprints import (
+    find_stale_figures,
+    get_code_fingerprint,
+    get_fingerprint_path,
+    get_mtimes,
+    get_written_files,
+    load_cached_stats,
+)
+from src.make_figures import write_json
+
+
+def _write_fingerprint(
+        out_dir: str, name: str, fingerprint: str) -> None:
+    write_json(get_fingerprint_path(out_dir, name), {
+        'fingerprint': fingerprint,
+        'files': ['{}.pdf'.format(name)],
+        'stats': {'a': 1},
+    })
+
+
+class TestLoadCachedStats:
+
+    @staticmethod
+    def test_load_cached_stats(tmpdir: str) -> None:
+        out_dir = str(tmpdir)
+        path = get_fingerprint_path(out_dir, 'fig')
+        assert load_cached_stats(path, 'abc', out_dir) is None
+        _write_fingerprint(out_dir, 'fig', 'abc')
+        # Output file is missing
+        assert load_cached_stats(path, 'abc', out_dir) is None
+        with open(os.path.join(out_dir, 'fig.pdf'), 'w'):
+            pass
+        assert load_cached_stats(path, 'abc', out_dir) == {'a': 1}
+        assert load_cached_stats(path, 'xyz', out_dir) is None
+
+
+class TestFindStaleFigures:
+
+    @staticmethod
+    def test_find_stale_figures(tmpdir: str) -> None:
+        out_dir = str(tmpdir)
+        for name in ('fig1', 'fig2'):
+            _write_fingerprint(out_dir, name, 'abc')
+            with open(os.path.join(out_dir, name + '.pdf'), 'w'):
+                pass
+        stats: dict = {}
+        stale = find_stale_figures(
+            {'fig0': 'abc', 'fig1': 'abc', 'fig2': 'xyz'},
+            out_dir, out_dir, stats)
+        assert stale == {'fig0': 'abc', 'fig2': 'xyz'}
+        assert stats == {'fig1': {'a': 1}}
+
+
+class TestGetWrittenFiles:
+
+    @staticmethod
+    def test_get_written_files(tmpdir: str) -> None:
+        out_dir = str(tmpdir)
+        with open(os.path.join(out_dir, 'old.pdf'), 'w'):
+            pass
+        os.makedirs(os.path.join(out_dir, 'subdir'))
+        mtimes = get_mtimes(out_dir)
+        assert list(mtimes) == ['old.pdf']
+        with open(os.path.join(out_dir, 'new.pdf'), 'w'):
+            pass
+        assert get_written_files(out_dir, mtimes) == ['new.pdf']
+
+
+class TestGetCodeFingerprint:
+
+    @staticmethod
+    def test_code_change(tmpdir: str) -> None:
+        src_dir = str(tmpdir)
+        with open(os.path.join(src_dir, 'a.py'), 'w') as f:
+            f.write('x = 1\n')
+        fingerprint = get_code_fingerprint(src_dir)
+        assert fingerprint == get_code_fingerprint(src_dir)
+        with open(os.path.join(src_dir, 'a.py'), 'w') as f:
+            f.write('x = 2\n')
+        assert fingerprint != get_code_fingerprint(src_dir)
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from _pytest.monkeypatch import MonkeyPatch
+import pytest
+
+from src.make_figures import (
+    _calculate_distribution_stats,
+    check_times_present,
+    count_experiment_consumers,
+    get_data_source_key,
+    get_experiment_ids,
+    load_figure_data,
+    parse_git_status,
+    get_figure_fingerprint,
+    reduce_to_environment_sections,
+    write_json,
+)
+from src import make_figures
+from src.types import DataTuple, EnvironmentConfig, RawData
+
+
+class TestCountExperimentConsumers:
+
+    @staticmethod
+    def test_shared_experiment() -> None:
+        consumers = count_experiment_consumers(
+            ['expression_survival', 'phylogeny'])
+        assert consumers == {'20210329.155953': 2}
+
+    @staticmethod
+    def test_nested_ids() -> None:
+        consumers = count_experiment_consumers(
+            ['growth', 'growth_basal'])
+        assert consumers['20201119.150828'] == 2
+        assert consumers['20201221.194828'] == 1
+        assert len(consumers) == 6
+
+    @staticmethod
+    def test_empty() -> None:
+        assert count_experiment_consumers([]) == {}
+
+
+class TestGetExperimentIds:
+
+    @staticmethod
+    def test_str() -> None:
+        assert get_experiment_ids('a') == ['a']
+
+    @staticmethod
+    def test_nested() -> None:
+        id_obj = {
+            'x': ('a', 'b'),
+            'y': {'z': ['c', 'a']},
+            'w': 'd',
+        }
+        assert get_experiment_ids(id_obj) == ['a', 'b', 'c', 'd']
+
+    @staticmethod
+    def test_empty() -> None:
+        assert get_experiment_ids({}) == []
+
+
+class TestLoadFigureData:
+
+    @staticmethod
+    def _make_cache() -> Dict[str, DataTuple]:
+        return {
+            experiment_id: (
+                RawData({0: {'agents': {}}}),
+                EnvironmentConfig({}),
+            )
+            for experiment_id in ('a', 'b')
+        }
+
+    def test_without_reducer(self) -> None:
+        data_cache = self._make_cache()
+        consumers = {'a': 1, 'b': 2}
+        figure_data = load_figure_data(
+            argparse.Namespace(), ['a', 'b'], data_cache, consumers)
+        assert figure_data == data_cache
+        assert consumers == {'a': 1, 'b': 2}
+
+    def test_reducer_releases_data(self) -> None:
+        data_cache = self._make_cache()
+        consumers = {'a': 1, 'b': 2}
+        figure_data = load_figure_data(
+            argparse.Namespace(), ['a', 'b'], data_cache, consumers,
+            lambda data_tuple: len(data_tuple[0]))
+        assert figure_data == {'a': 1, 'b': 1}
+        assert consumers == {'a': 0, 'b': 1}
+        assert list(data_cache) == ['b']
+
+
+class TestReduceToEnvironmentSections:
+
+    @staticmethod
+    def test_keeps_section_and_final_times(
+            monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            make_figures, 'ENVIRONMENT_SECTION_TIMES', (1, 3))
+        config = EnvironmentConfig({})
+        data = RawData({
+            float(time): {'time': time}
+            for time in range(6)
+        })
+        reduced, reduced_config = reduce_to_environment_sections(
+            (data, config))
+        assert reduced == {
+            1.: {'time': 1},
+            3.: {'time': 3},
+            5.: {'time': 5},
+        }
+        assert reduced_config is config
+
+
+class TestWriteJson:
+
+    @staticmethod
+    def test_numpy_and_numeric_keys(tmpdir: str) -> None:
+        path = os.path.join(tmpdir, 'stats.json')
+        stats = {
+            1.5: (np.float64(0.5), np.array([1, 2])),
+            0: {'count': np.int64(3)},
+        }
+        write_json(path, stats)
+        with open(path, 'r') as f:
+            loaded = json.load(f)
+        assert loaded == {'1.5': [0.5, [1, 2]], '0': {'count': 3}}
+
+    @staticmethod
+    def test_non_finite(tmpdir: str) -> None:
+        path = os.path.join(tmpdir, 'stats.json')
+        write_json(path, {'q1': np.float64('nan'), 'q3': np.inf})
+        with open(path, 'r') as f:
+            loaded = json.load(f)
+        assert np.isnan(loaded['q1'])
+        assert loaded['q3'] == np.inf
+
+
+class TestCalculateDistributionStats:
+
+    @staticmethod
+    def test_stats() -> None:
+        replicates_data: List[
+                Tuple[Dict[str, Sequence[float]], str]] = [
+            ({'AmpC': [4., 0., 2., 1., 3.]}, 'red'),
+            ({'AmpC': [0., 0., 10., 20., 30.]}, 'blue'),
+        ]
+        stats = _calculate_distribution_stats(replicates_data)
+        num_zeros, mins, q1, q2, q3, maxes, num_cells = stats['AmpC']
+        assert num_zeros == 3
+        np.testing.assert_array_equal(mins, [0, 0])
+        np.testing.assert_array_equal(q1, [1, 0])
+        np.testing.assert_array_equal(q2, [2, 10])
+        np.testing.assert_array_equal(q3, [3, 20])
+        np.testing.assert_array_equal(maxes, [4, 30])
+        assert num_cells == 10
+        # Input data is not modified
+        assert replicates_data[0][0]['AmpC'] == [4., 0., 2., 1., 3.]
+
+
+class TestCheckTimesPresent:
+
+    sorted_times = np.array([0., 2., 4., 6.])
+
+    def test_present(self) -> None:
+        check_times_present(self.sorted_times, np.array([0., 4., 6.]))
+
+    def test_missing(self) -> None:
+        with pytest.raises(ValueError, match=r'\[3\.0, 8\.0\]'):
+            check_times_present(
+                self.sorted_times, np.array([2., 3., 8.]))
+
+
+class TestGetFigureFingerprint:
+
+    @staticmethod
+    def test_inputs_change_fingerprint() -> None:
+        source = ('localhost', 27017, 'simulations')
+        fingerprint = get_figure_fingerprint(
+            'phylogeny', 'code', b'{}', source)
+        assert fingerprint == get_figure_fingerprint(
+            'phylogeny', 'code', b'{}', source)
+        assert fingerprint != get_figure_fingerprint(
+            'centrality', 'code', b'{}', source)
+        assert fingerprint != get_figure_fingerprint(
+            'phylogeny', 'other', b'{}', source)
+        assert fingerprint != get_figure_fingerprint(
+            'phylogeny', 'code', b'[]', source)
+        assert fingerprint != get_figure_fingerprint(
+            'phylogeny', 'code', b'{}', ('localhost', 27017, 'other'))
+
+
+class TestGetDataSourceKey:
+
+    @staticmethod
+    def test_mongo() -> None:
+        args = argparse.Namespace(
+            data_path='', host='localhost', port=27017,
+            database_name='simulations')
+        assert get_data_source_key(args, ['a']) == (
+            'localhost', 27017, 'simulations')
+
+    @staticmethod
+    def test_data_path_file_changes(tmpdir: str) -> None:
+        args = argparse.Namespace(
+            data_path=str(tmpdir), host='localhost', port=27017,
+            database_name='simulations')
+        path = os.path.join(tmpdir, 'a.json')
+        with open(path, 'w') as f:
+            f.write('{}')
+        key = get_data_source_key(args, ['a'])
+        assert key == get_data_source_key(args, ['a'])
+        with open(path, 'w') as f:
+            f.write('{"data": {}}')
+        assert key != get_data_source_key(args, ['a'])
+
+
+class TestParseGitStatus:
+
+    @staticmethod
+    def test_branch() -> None:
+        status = (
+            '# branch.oid 0123abcd\n'
+            '# branch.head master\n'
+            '# branch.upstream origin/master\n'
+            '# branch.ab +0 -0\n'
+            '1 .M N... 100644 100644 100644 aaaa bbbb src/a.py\n'
+            '? new.txt'
+        )
+        assert parse_git_status(status) == (
+            '0123abcd',
+            'master',
+            [
+                '1 .M N... 100644 100644 100644 aaaa bbbb src/a.py',
+                '? new.txt',
+            ],
+        )
+
+    @staticmethod
+    def test_detached() -> None:
+        status = '# branch.oid 0123abcd\n# branch.head (detached)'
+        assert parse_git_status(status) == ('0123abcd', None, [])
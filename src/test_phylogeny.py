@@ -1,6 +1,7 @@
 from typing import Tuple, cast
 
 from ete3 import TreeNode
+import pytest
 
 from src.phylogeny import make_ete_trees
 
@@ -42,3 +43,15 @@ class TestMakeEteTree:
         traversal = self._traverse(trees[0])
         expected_traversal = ('agent',)
         assert traversal == expected_traversal
+
+    def test_iterator(self) -> None:
+        agent_ids = iter(('agent1', 'agent', 'agent0'))
+        trees = make_ete_trees(agent_ids)
+        assert len(trees) == 1
+        traversal = self._traverse(trees[0])
+        assert traversal == ('agent', 'agent0', 'agent1')
+
+    @staticmethod
+    def test_non_numeric() -> None:
+        with pytest.raises(ValueError, match='non-numeric'):
+            make_ete_trees(('agent', 'agent0', 'agentx'))
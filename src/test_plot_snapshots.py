@@ -0,0 +1,155 @@
+import os
+import random
+from typing import Dict, List
+
+import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
+
+from src.plot_snapshots import (  # type: ignore
+    color_phylogeny,
+    colors_to_rgb,
+    get_phylogeny_colors_from_names,
+    plot_agents,
+    plot_snapshots,
+)
+
+
+class TestColorsToRgb:
+
+    @staticmethod
+    def test_mixed_colors() -> None:
+        rgbs = colors_to_rgb(['red', [2 / 3, 1, 1], 'red', [0, 0, 0]])
+        assert np.array_equal(
+            rgbs, [[1, 0, 0], [0, 0, 1], [1, 0, 0], [0, 0, 0]])
+
+
+class TestColorPhylogeny:
+
+    @staticmethod
+    def test_calls_do_not_share_colors() -> None:
+        phylogeny: Dict[str, List[str]] = {
+            'a': ['a0', 'a1'], 'a0': [], 'a1': []}
+        first = color_phylogeny('a', phylogeny, [0.5, 1, 0.7])
+        second = color_phylogeny('b', {'b': []}, [0.5, 1, 0.7])
+        assert set(first) == {'a', 'a0', 'a1'}
+        assert set(second) == {'b'}
+
+    @staticmethod
+    def test_fills_given_dict() -> None:
+        colors: Dict[str, List[float]] = {}
+        color_phylogeny(
+            'a', {'a': ['a0'], 'a0': []}, [0.5, 1, 0.7], colors)
+        assert set(colors) == {'a', 'a0'}
+
+
+class TestGetPhylogenyColorsFromNames:
+
+    @staticmethod
+    def test_daughters_mutate_from_mother() -> None:
+        np.random.seed(0)
+        colors = get_phylogeny_colors_from_names(
+            ['agent', 'agent0', 'agent1', 'agent00'],
+            initial_hues={'agent': 0.5})
+        assert colors['agent'][0] == 0.5
+        for daughter, mother in (
+                ('agent0', 'agent'), ('agent1', 'agent'),
+                ('agent00', 'agent0')):
+            assert np.allclose(
+                colors[daughter], colors[mother], atol=0.2)
+
+
+class TestPlotAgents:
+
+    @staticmethod
+    def test_rgbs_override_colors() -> None:
+        agents = {
+            'agent': {
+                'boundary': {
+                    'location': [5, 5],
+                    'angle': 0,
+                    'length': 2,
+                    'width': 1,
+                    'dead': True,
+                },
+            },
+        }
+        fig, ax = plt.subplots()
+        plot_agents(
+            ax, agents, {'agent': [0, 0, 0]}, dead_color=[0, 0, 0.5],
+            agent_rgbs=[[1, 0, 0]])
+        # each agent is a membrane followed by its fill
+        fill_rgba = ax.collections[0].get_colors()[1]
+        plt.close(fig)
+        assert np.array_equal(fill_rgba, [1, 0, 0, 1])
+
+
+class TestPlotSnapshots:
+
+    @staticmethod
+    def _get_data() -> dict:
+        agent = {
+            'boundary': {
+                'location': [5, 5],
+                'angle': 0,
+                'length': 2,
+                'width': 1,
+            },
+        }
+        return {
+            'agents': {
+                time: {'agent': agent} for time in (0., 1.)
+            },
+            'fields': {
+                time: {'glc': [[0, time], [2, 3]]} for time in (0., 1.)
+            },
+            'config': {'bounds': [10, 10]},
+        }
+
+    @staticmethod
+    def test_field_stats(tmpdir: str) -> None:
+        stats = plot_snapshots(
+            TestPlotSnapshots._get_data(),
+            {'out_dir': tmpdir, 'n_snapshots': 2},
+        )
+        assert stats['agents'] == {0.: 1, 1.: 1}
+        assert stats['fields']['glc'][1.] == (0, 0.75, 1.5, 2.25, 3)
+
+    @staticmethod
+    def test_skip_stats(tmpdir: str) -> None:
+        stats = plot_snapshots(
+            TestPlotSnapshots._get_data(),
+            {
+                'out_dir': tmpdir,
+                'n_snapshots': 2,
+                'collect_stats': False,
+            },
+        )
+        assert stats == {'agents': {0.: 1, 1.: 1}}
+
+    @staticmethod
+    def test_leaves_other_figures_open(tmpdir: str) -> None:
+        fig = plt.figure()
+        open_figures = plt.get_fignums()
+        plot_snapshots(
+            TestPlotSnapshots._get_data(),
+            {'out_dir': tmpdir, 'n_snapshots': 2},
+        )
+        assert plt.get_fignums() == open_figures
+        plt.close(fig)
+
+    @staticmethod
+    def test_return_image_matches_saved(tmpdir: str) -> None:
+        plot_config = {
+            'out_dir': tmpdir, 'filename': 'snapshots.png',
+            'n_snapshots': 2}
+        random.seed(0)
+        plot_snapshots(TestPlotSnapshots._get_data(), plot_config)
+        random.seed(0)
+        image = plot_snapshots(
+            TestPlotSnapshots._get_data(),
+            dict(plot_config, return_image=True),
+        )
+        saved = Image.open(os.path.join(tmpdir, 'snapshots.png'))
+        assert image.dtype == np.uint8
+        assert np.array_equal(image, np.asarray(saved.convert('RGB')))
@@ -1,6 +1,9 @@
+import json
+import pathlib
 from typing import Dict, Union
 
 from src.process_expression_data import (
+    load_end_timepoint,
     raw_data_to_end_expression_table,
 )
 from src.types import RawData, Path
@@ -112,3 +115,38 @@ class TestRawDataToEndExpressionTable:
         table = raw_data_to_end_expression_table(data, name_to_path_map)
         assert set(table['protein']) == set([0, 0, 0])
         assert set(table['volume']) == set([0, 4, 0])
+
+    def test_missing_paths(self) -> None:
+        data = RawData({
+            1: {
+                'agents': {
+                    'agent1': self._make_agent_data(2, {'protein1': 4}),
+                    'agent2': self._make_agent_data(4, {}),
+                },
+            },
+        })
+        name_to_path_map: Dict[str, Path] = {
+            'protein1': ('counts', 'protein1'),
+            'protein2': ('other_counts', 'protein2'),
+        }
+        table = raw_data_to_end_expression_table(data, name_to_path_map)
+        assert sorted(table['protein1']) == [0, 4 / 2]
+        assert table['protein2'].tolist() == [0, 0]
+
+
+class TestLoadEndTimepoint:
+
+    @staticmethod
+    def test_numeric_end_time(tmp_path: pathlib.Path) -> None:
+        json_path = tmp_path / 'data.json'
+        with open(json_path, 'w') as f:
+            json.dump({'9.0': {'a': 1}, '10.0': {'a': 2.5}}, f)
+        assert load_end_timepoint(str(json_path)) == {10.0: {'a': 2.5}}
+
+    @staticmethod
+    def test_infinite_values(tmp_path: pathlib.Path) -> None:
+        json_path = tmp_path / 'data.json'
+        with open(json_path, 'w') as f:
+            json.dump({'1.0': {'a': 1}, '2.0': {'a': float('inf')}}, f)
+        end_data = load_end_timepoint(str(json_path))
+        assert end_data == {2.0: {'a': float('inf')}}
@@ -1,3 +1,9 @@
+from typing import Any, Dict, List, Sequence
+
+from matplotlib import pyplot as plt
+from _pytest.monkeypatch import MonkeyPatch
+
+from src import ridgeline
 from src.ridgeline import flatten
 
 
@@ -35,3 +41,22 @@ class TestFlatten:
     def test_flatten_depth_first() -> None:
         flat = flatten([[1, 2], [3, [4, 5]]])
         assert flat == [1, 2, 3, 4, 5]
+
+
+class TestGetRidgelinePlot:
+
+    @staticmethod
+    def test_identical_samples_estimated_once(
+            monkeypatch: MonkeyPatch) -> None:
+        calls: List[Any] = []
+        gaussian_kde = ridgeline.gaussian_kde
+
+        def counting_kde(values: Any) -> Any:
+            calls.append(values)
+            return gaussian_kde(values)
+
+        monkeypatch.setattr(ridgeline, 'gaussian_kde', counting_kde)
+        data: Dict[str, Sequence[float]] = {'a': [1, 2, 4], 'b': [0]}
+        fig = ridgeline.get_ridgeline_plot([(data, 'k'), (data, 'r')])
+        plt.close(fig)
+        assert len(calls) == 1
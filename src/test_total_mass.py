@@ -0,0 +1,22 @@
+from matplotlib import pyplot as plt
+import numpy as np
+
+from src.total_mass import plot_total_mass
+
+
+class TestPlotTotalMass:
+
+    @staticmethod
+    def test_unlabeled_replicates() -> None:
+        replicates = [
+            {0.: 1., 3600.: 2., 7200.: 4.},
+            {0.: 1.5, 3600.: 2.5, 7200.: 3.},
+        ]
+        fig, ax = plt.subplots()
+        q25, median, q75 = plot_total_mass(replicates, ax)
+        lines = ax.get_lines()
+        plt.close(fig)
+        assert len(lines) == 2
+        assert np.array_equal(lines[1].get_ydata(), [1.5, 2.5, 3.])
+        assert np.array_equal(median, [1.25, 2.25, 3.5])
+        assert np.all(q25 <= median) and np.all(median <= q75)
@@ -20,32 +20,35 @@ def get_total_mass(agents_data: Dict) -> float:
     Returns:
         The total mass of the agents.
     '''
+    # Index the mass directly instead of through get_in, which recurses
+    # once per path element
+    store_key, mass_key = MASS_PATH
     total_mass = 0.
     for agent_data in agents_data.values():
-        mass = get_in(agent_data, MASS_PATH)
-        total_mass += mass
+        total_mass += agent_data[store_key][mass_key]
     return total_mass
 
 
-def get_total_mass_timeseries(data: RawData) -> List[float]:
-    '''Get a timeseries of the total mass of a simulation.
+def get_total_mass_by_time(data: RawData) -> Dict[float, float]:
+    '''Get the total mass of a simulation at each timepoint.
+
+    This reduces a simulation's data to just what the total mass plots
+    need, so the full data can be freed before plotting.
 
     Args:
         data: Data from the simulation.
 
     Returns:
-        A list of the total cell mass in the simulation over time.
+        Map from each time to the total cell mass at that time.
     '''
-    times = sorted(data.keys())
-    mass_timeseries = []
-    for time in times:
-        agents_data = get_in(data[time], AGENTS_PATH)
-        mass_timeseries.append(get_total_mass(agents_data))
-    return mass_timeseries
+    return {
+        time: get_total_mass(get_in(time_data, AGENTS_PATH))
+        for time, time_data in data.items()
+    }
 
 
 def get_total_mass_plot(
-        datasets: Dict[str, List[RawData]],
+        datasets: Dict[str, List[Dict[float, float]]],
         colors: List[str],
         fontsize: float = 36,
         vlines: Iterable[Tuple[float, float, str, str]] = tuple(),
@@ -57,7 +60,9 @@ def get_total_mass_plot(
 
     Args:
         datasets: Map from the label to associate with a group of
-            simulations to a list of the datasets in that group.
+            simulations to a list of the total masses over time (from
+            :py:func:`get_total_mass_by_time`) of the simulations in
+            that group.
         colors: Map from a group label to the color to show that group's
             data in.
         fontsize: Size of all text on figure.
@@ -76,10 +81,8 @@ def get_total_mass_plot(
         filtered_replicates = []
         for replicate in replicates:
             # Exclude first timepoint, which is often wrong
-            filtered = RawData({
-                key: val for key, val in replicate.items()
-                if key != min(replicate.keys())
-            })
+            filtered = dict(replicate)
+            del filtered[min(filtered)]
             filtered_replicates.append(filtered)
         label_quartiles = plot_total_mass(
             filtered_replicates, ax, label, colors[i], fontsize)
@@ -100,7 +103,7 @@ def get_total_mass_plot(
 
 
 def plot_total_mass(
-        replicates: List[RawData],
+        replicates: List[Dict[float, float]],
         ax: plt.Axes,
         label: str = '',
         color: str = 'black',
@@ -112,8 +115,8 @@ def plot_total_mass(
     IQR. The median and IQR are computed over the replicates.
 
     Args:
-        replicates: A list of the raw data dictionary for each
-            replicate.
+        replicates: A list of the map from time to total mass (from
+            :py:func:`get_total_mass_by_time`) for each replicate.
         ax: The axes to plot on.
         label: Label to associate with the curve showing the median
             total mass.
@@ -127,11 +130,10 @@ def plot_total_mass(
     mass_timeseries = []
     for replicate in replicates:
         assert sorted(replicate.keys()) == times
-        replicate_timeseries = get_total_mass_timeseries(replicate)
-        mass_timeseries.append(replicate_timeseries)
+        mass_timeseries.append([replicate[time] for time in times])
     mass_matrix = np.array(mass_timeseries)
-    median = np.median(mass_matrix, axis=0)
-    q25, q75 = np.percentile(mass_matrix, [25, 75], axis=0)
+    q25, median, q75 = np.quantile(
+        mass_matrix, [0.25, 0.5, 0.75], axis=0)
     times_hours = tuple(time / 60 / 60 for time in times)
     if label:
         ax.semilogy(  # type: ignore
@@ -142,8 +144,9 @@ def plot_total_mass(
         ax.legend(  # type: ignore
             prop={'size': fontsize}, frameon=False)
     else:
+        # One column per replicate, so one call draws every replicate
         ax.semilogy(  # type: ignore
-            times_hours, mass_timeseries, color=color)
+            times_hours, mass_matrix.T, color=color)
         ax.fill_between(  # type: ignore
             times_hours, q25, q75, color=color, alpha=0.2,
             edgecolor='none')